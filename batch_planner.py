@@ -0,0 +1,81 @@
+# Turns an order of N identical drinks into one pour plan.
+# By default every drink gets its own glass: one fill per drink, with a
+# pause between fills so the guest can swap the glass. An order poured into
+# a pitcher fits as many drinks as the pitcher holds into each fill, so each
+# pump runs once per fill for the combined volume instead of once per drink;
+# the robot waits for the pitcher to be set down before the first fill.
+
+# Capacity of the pitcher used for pitcher orders (ml)
+pitcher_ml = 1000
+
+# Time given to swap the glass between drinks, or to set a pitcher down (seconds)
+swap_pause = 8
+
+
+class Fill:
+    __slots__ = ("drinks", "run_times")
+
+    def __init__(self, drinks, run_times):
+        self.drinks = drinks
+        self.run_times = run_times  # list of (motor_pin, run_time)
+
+
+class BatchPlan:
+    def __init__(self, fills, swap_pause=swap_pause, vessel="glass"):
+        self.fills = fills
+        self.swap_pause = swap_pause
+        self.vessel = vessel  # "glass" (one drink per fill) or "pitcher"
+
+    def pause_before(self, fill):
+        # Seconds the robot waits for the guest before pouring fill `fill`
+        if fill > 0 or self.vessel == "pitcher":
+            return self.swap_pause
+        return 0
+
+    def steps(self):
+        return sum(len(fill.run_times) for fill in self.fills)
+
+    def duration(self, mode="sequential"):
+        # Expected pour time in seconds, ignoring relay jitter and power-budget staggering
+        per_fill = max if mode == "atonce" else sum
+        pouring = sum(per_fill(run_time for _, run_time in fill.run_times) for fill in self.fills)
+        return pouring + sum(self.pause_before(i) for i in range(len(self.fills)))
+
+
+def merge_run_times(run_times):
+    # One continuous run per pin, keeping the recipe's pour order
+    merged = {}
+    for motor_pin, run_time in run_times:
+        merged[motor_pin] = merged.get(motor_pin, 0) + run_time
+    return list(merged.items())
+
+
+def scale_run_time(run_time, drinks, dead_time):
+    # A continuous run primes the line once, however many drinks it pours
+    return dead_time + (run_time - dead_time) * drinks
+
+
+def single_fill(run_times):
+    return BatchPlan([Fill(1, list(run_times))], swap_pause=0)
+
+
+def plan_batch(run_times, num_cocktails, drink_ml, pitcher=False, pitcher_ml=pitcher_ml, swap_pause=swap_pause,
+               dead_times=None):
+    num_cocktails = max(1, int(num_cocktails))
+    if not pitcher:
+        drinks_per_fill = 1
+    elif drink_ml > 0:
+        drinks_per_fill = max(1, int(pitcher_ml // drink_ml))
+    else:
+        drinks_per_fill = num_cocktails
+
+    dead_times = dead_times or {}
+    merged = merge_run_times(run_times)
+    fills = []
+    remaining = num_cocktails
+    while remaining > 0:
+        drinks = min(drinks_per_fill, remaining)
+        fills.append(Fill(drinks, [(motor_pin, scale_run_time(run_time, drinks, dead_times.get(motor_pin, 0)))
+                                   for motor_pin, run_time in merged]))
+        remaining -= drinks
+    return BatchPlan(fills, swap_pause, vessel="pitcher" if pitcher else "glass")
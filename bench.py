@@ -0,0 +1,210 @@
+# Pour accuracy and throughput benchmarks against the simulated relay board.
+#
+#   python bench.py                                  # virtual clock, finishes in seconds
+#   python bench.py --clock real --time-scale 0.01   # real sleeps, pours 100x shorter
+#   python bench.py --clock precise --time-scale 0.01  # sleep plus spin finish
+#   python bench.py --save results.json --compare previous.json
+#
+# Every recipe of holiday.json and of synthetic menus is replayed through the
+# sequential, at-once and batched pour paths.
+
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+
+import batch_planner
+from batch_planner import plan_batch
+from calibration import CalibrationProfile
+import power_budget
+from pour_engine import PourExecutor, PourJob
+from power_budget import PowerBudget
+from recipe_store import RecipeStore
+from relay_board import PrecisionClock, RealClock, SimulatedRelayBoard, VirtualClock
+
+# Same relay layout as holiday.py; JSON motor numbers index straight into it
+relay_pins = [40, 38, 36, 32, 37, 35, 33, 31, 23, 21, 19, 15, 13, 11, 7]
+
+# Flow rate of the simulated pumps (ml/s)
+flow_rate = 1.5
+
+# Synthetic menu sizes replayed after holiday.json
+menu_sizes = (10, 100, 1000)
+
+# Drinks per pitcher order on the batched path
+batch_size = 4
+
+paths = ("sequential", "atonce", "batched")
+
+
+def synthetic_menu(size, motors=11, seed=0):
+    rng = random.Random(seed + size)
+    menu = {}
+    for i in range(size):
+        chosen = rng.sample(range(1, motors + 1), rng.randint(2, 7))
+        menu[f"Synthetic {i + 1}"] = {
+            'image_url': None,
+            'imgpath': None,
+            'ingredients': [{'name': f"Spirit {motor}", 'quantity': rng.choice((15, 30, 45, 60, 90)), 'motor': motor}
+                            for motor in chosen],
+        }
+    return menu
+
+
+def measure_startup(menu, calibration):
+    start = time.perf_counter()
+    store = RecipeStore(menu, relay_pins, flow_rate=flow_rate, calibration=calibration)
+    return store, time.perf_counter() - start
+
+
+def relay_runs(board, since):
+    # Durations of each relay-on stretch after transition index `since`, per pin
+    started = {}
+    runs = {}
+    for at, pin, on in board.transitions[since:]:
+        if on:
+            started[pin] = at
+        elif pin in started:
+            runs.setdefault(pin, []).append(at - started.pop(pin))
+    return runs
+
+
+def replay(store, path, clock, time_scale=1.0):
+    board = SimulatedRelayBoard(relay_pins, clock=clock)
+    finished = threading.Event()
+    budget = PowerBudget(inrush_time=power_budget.inrush_time * time_scale)
+    executor = PourExecutor(None, board.relay_on, board.relay_off,
+                            on_done=lambda job: finished.set(), clock=clock, power_budget=budget)
+
+    drinks = 0
+    errors = []
+    blocking = []
+    pour_time = 0.0
+    try:
+        for name in store:
+            recipe = store[name]
+            num_cocktails = batch_size if path == "batched" else 1
+
+            # What the Tk callback pays for: planning plus handing the job over
+            finished.clear()
+            since = len(board.transitions)
+            start = time.perf_counter()
+            plan = plan_batch(recipe.run_times, num_cocktails, recipe.drink_ml, pitcher=path == "batched",
+                              swap_pause=batch_planner.swap_pause * time_scale, dead_times=recipe.dead_times)
+            mode = "atonce" if path == "atonce" else "sequential"
+            job = executor.submit(PourJob(name, num_cocktails, recipe.run_times, mode=mode, plan=plan))
+            blocking.append(time.perf_counter() - start)
+            finished.wait()
+
+            drinks += num_cocktails
+            pour_time += job.finished_at - job.started_at
+
+            runs = relay_runs(board, since)
+            for fill in plan.fills:
+                for motor_pin, planned in fill.run_times:
+                    actual = runs.get(motor_pin, [])
+                    if actual:
+                        errors.append(actual.pop(0) - planned)
+    finally:
+        executor.shutdown()
+
+    abs_errors = sorted(abs(error) for error in errors) or [0.0]
+    return {
+        'drinks': drinks,
+        'pour_seconds': pour_time,
+        'drinks_per_hour': drinks / pour_time * 3600 if pour_time else 0.0,
+        'timing_error_mean_ms': sum(abs_errors) / len(abs_errors) * 1000,
+        'timing_error_p95_ms': abs_errors[min(len(abs_errors) - 1, int(len(abs_errors) * 0.95))] * 1000,
+        'timing_error_max_ms': abs_errors[-1] * 1000,
+        'ui_blocking_max_ms': max(blocking) * 1000 if blocking else 0.0,
+        'ui_blocking_mean_ms': sum(blocking) / len(blocking) * 1000 if blocking else 0.0,
+        'max_concurrent_pumps': board.max_concurrent(),
+        'peak_amps': budget.peak_amps,
+    }
+
+
+def current_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(args):
+    # Shorter pours for real-clock runs: a faster pump pours the same volume sooner
+    calibration = CalibrationProfile(default_flow_rate=flow_rate / args.time_scale)
+
+    with open(args.recipes) as file:
+        menus = {'holiday.json': json.load(file)}
+    for size in args.sizes:
+        menus[f"synthetic-{size}"] = synthetic_menu(size)
+
+    results = {}
+    for menu_name, menu in menus.items():
+        store, startup = measure_startup(menu, calibration)
+        results[menu_name] = {'recipes': len(store), 'rejected': len(store.errors),
+                              'startup_ms': startup * 1000, 'paths': {}}
+        for path in paths:
+            clock = {'virtual': VirtualClock, 'real': RealClock, 'precise': PrecisionClock}[args.clock]()
+            results[menu_name]['paths'][path] = replay(store, path, clock, args.time_scale)
+    return results
+
+
+def print_results(results):
+    print(f"{'menu':<16}{'path':<12}{'drinks/h':>10}{'err mean':>10}{'err max':>10}{'ui max':>10}{'startup':>10}"
+          f"{'pumps':>7}{'peak':>8}")
+    for menu_name, menu in results.items():
+        for path, metrics in menu['paths'].items():
+            print(f"{menu_name:<16}{path:<12}{metrics['drinks_per_hour']:>10.1f}"
+                  f"{metrics['timing_error_mean_ms']:>8.2f}ms{metrics['timing_error_max_ms']:>8.2f}ms"
+                  f"{metrics['ui_blocking_max_ms']:>8.2f}ms{menu['startup_ms']:>8.2f}ms"
+                  f"{metrics['max_concurrent_pumps']:>7}{metrics['peak_amps']:>7.1f}A")
+
+
+def compare(results, previous, results_clock, results_time_scale):
+    print(f"\nCompared with {previous.get('version', 'previous run')}:")
+    if (previous.get('clock'), previous.get('time_scale')) != (results_clock, results_time_scale):
+        print("  (warning: runs used different clocks or time scales)")
+    for menu_name, menu in results.items():
+        old_menu = previous['results'].get(menu_name)
+        if old_menu is None:
+            continue
+        for path, metrics in menu['paths'].items():
+            old = old_menu['paths'].get(path)
+            if old is None:
+                continue
+            print(f"{menu_name:<16}{path:<12}"
+                  f"drinks/h {metrics['drinks_per_hour'] - old['drinks_per_hour']:+.1f}  "
+                  f"err mean {metrics['timing_error_mean_ms'] - old['timing_error_mean_ms']:+.2f}ms  "
+                  f"ui max {metrics['ui_blocking_max_ms'] - old['ui_blocking_max_ms']:+.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pour paths on the simulated relay board")
+    parser.add_argument("--recipes", default="holiday.json")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(menu_sizes))
+    parser.add_argument("--clock", choices=("virtual", "real", "precise"), default="virtual")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="multiply planned run times, e.g. 0.01 for quick real-clock runs")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file), args.clock, args.time_scale)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({'version': current_version(), 'timestamp': time.time(),
+                       'clock': args.clock, 'time_scale': args.time_scale, 'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import os
+
+# Where the per-pump calibration profile is kept
+profile_path = os.environ.get("CBR_CALIBRATION", "calibration.json")
+
+
+class PumpCurve:
+    __slots__ = ("flow_rate", "dead_time")
+
+    def __init__(self, flow_rate, dead_time=0.0):
+        self.flow_rate = flow_rate  # ml/s once liquid reaches the spout
+        self.dead_time = dead_time  # seconds to prime the line before anything pours
+
+    def run_time(self, volume, viscosity=1.0):
+        return self.dead_time + volume * viscosity / self.flow_rate
+
+
+class CalibrationProfile:
+    # Flow curve per motor plus a viscosity factor per ingredient. Motors are
+    # numbered as in holiday.json; pumps without a curve use the defaults.
+    def __init__(self, pumps=None, viscosity=None, default_flow_rate=1.5, default_dead_time=0.0):
+        self.pumps = pumps if pumps is not None else {}
+        self.viscosity = viscosity if viscosity is not None else {}
+        self.default = PumpCurve(default_flow_rate, default_dead_time)
+        self.path = None
+
+    def curve(self, motor):
+        return self.pumps.get(motor, self.default)
+
+    def viscosity_of(self, ingredient_name):
+        return self.viscosity.get((ingredient_name or "").lower(), 1.0)
+
+    def run_time(self, motor, volume, ingredient_name=None):
+        return self.curve(motor).run_time(volume, self.viscosity_of(ingredient_name))
+
+    def dead_time(self, motor):
+        return self.curve(motor).dead_time
+
+    def set_curve(self, motor, flow_rate, dead_time):
+        self.pumps[motor] = PumpCurve(flow_rate, dead_time)
+
+    @classmethod
+    def load(cls, path=profile_path, default_flow_rate=1.5):
+        # A missing profile is not an error: every pump just uses the default
+        profile = cls(default_flow_rate=default_flow_rate)
+        profile.path = path
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return profile
+        except (OSError, ValueError) as e:
+            print(f"Error reading calibration profile {path}: {e}")
+            return profile
+
+        for motor, curve in data.get('pumps', {}).items():
+            profile.pumps[int(motor)] = PumpCurve(curve['flow_rate'], curve.get('dead_time', 0.0))
+        for name, factor in data.get('viscosity', {}).items():
+            profile.viscosity[name.lower()] = factor
+        return profile
+
+    def save(self, path=None):
+        path = path or self.path or profile_path
+        data = {
+            'pumps': {str(motor): {'flow_rate': curve.flow_rate, 'dead_time': curve.dead_time}
+                      for motor, curve in sorted(self.pumps.items())},
+            'viscosity': dict(sorted(self.viscosity.items())),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file, indent=2)
+        os.replace(tmp_path, path)
+        self.path = path
+
+
+def fit_pump_curve(samples):
+    # Least-squares fit of volume = flow_rate * (seconds - dead_time) over
+    # (seconds, measured_ml) bursts. Needs at least two different burst lengths.
+    n = len(samples)
+    if n < 2:
+        raise ValueError("need at least two bursts to fit a pump")
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var_t == 0:
+        raise ValueError("bursts must have different lengths")
+    flow_rate = sum((t - mean_t) * (v - mean_v) for t, v in samples) / var_t
+    if flow_rate <= 0:
+        raise ValueError("measured volumes do not grow with burst length")
+    dead_time = max(0.0, mean_t - mean_v / flow_rate)
+    return flow_rate, dead_time
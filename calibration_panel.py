@@ -0,0 +1,150 @@
+import tkinter as tk
+from tkinter import ttk
+
+from calibration import fit_pump_curve
+from pour_engine import PourJob
+
+# Burst lengths run on each pump, in seconds
+burst_lengths = (2, 4, 8)
+
+
+class CalibrationPanel:
+    # Guided calibration inside the pump-control window. For the selected
+    # motor it runs timed bursts of several lengths, records the measured ml
+    # (typed in or read from a scale), fits a flow rate and priming time and
+    # saves them to the calibration profile used by the pour planner.
+    def __init__(self, parent, relay_pins, motor_dropdown, pour_executor, calibration, scale=None):
+        self.relay_pins = relay_pins
+        self.motor_dropdown = motor_dropdown
+        self.pour_executor = pour_executor
+        self.calibration = calibration
+        self.scale = scale
+        self.samples = {}  # motor -> list of (seconds, measured_ml)
+        self.burst_job = None
+        self.last_burst = None  # (motor, seconds) waiting for its measurement
+
+        frame = ttk.LabelFrame(parent, text="Calibration")
+        frame.pack(padx=10, pady=10, fill=tk.X)
+
+        ttk.Label(frame, text="Burst lengths (s):").grid(row=0, column=0, sticky=tk.W)
+        self.bursts_entry = ttk.Entry(frame)
+        self.bursts_entry.insert(0, ", ".join(str(seconds) for seconds in burst_lengths))
+        self.bursts_entry.grid(row=0, column=1)
+
+        self.burst_button = ttk.Button(frame, text="Run next burst", command=self.run_burst)
+        self.burst_button.grid(row=1, column=0, columnspan=2, pady=5)
+
+        ttk.Label(frame, text="Measured (ml):").grid(row=2, column=0, sticky=tk.W)
+        self.measured_entry = ttk.Entry(frame)
+        self.measured_entry.grid(row=2, column=1)
+
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=3, column=0, columnspan=2, pady=5)
+        ttk.Button(buttons, text="Read scale", command=self.read_scale,
+                   state=tk.NORMAL if scale is not None else tk.DISABLED).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Record", command=self.record).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Fit & save", command=self.fit_and_save).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Clear motor", command=self.clear_motor).pack(side=tk.LEFT)
+
+        self.status_label = ttk.Label(frame, text="Select a motor and run a burst")
+        self.status_label.grid(row=4, column=0, columnspan=2, sticky=tk.W)
+
+    def selected_motor(self):
+        # Motors are numbered from 1 like in the dropdown
+        motor_idx = self.motor_dropdown.current()
+        return motor_idx + 1 if motor_idx >= 0 else None
+
+    def burst_lengths(self):
+        return [float(part) for part in self.bursts_entry.get().split(",") if part.strip()]
+
+    def next_burst(self, motor):
+        lengths = self.burst_lengths()
+        done = len(self.samples.get(motor, []))
+        return lengths[done % len(lengths)]
+
+    def run_burst(self):
+        motor = self.selected_motor()
+        if motor is None:
+            self.status_label.configure(text="Select a motor first")
+            return
+        if self.burst_job is not None:
+            self.status_label.configure(text="A burst is still running")
+            return
+        try:
+            seconds = self.next_burst(motor)
+        except (ValueError, ZeroDivisionError):
+            self.status_label.configure(text="Enter burst lengths like 2, 4, 8")
+            return
+
+        self.burst_job = PourJob(f"Motor {motor}", 1, [(self.relay_pins[motor - 1], seconds)])
+        self.burst_job.motor = motor
+        self.burst_job.seconds = seconds
+        self.pour_executor.submit(self.burst_job)
+        self.burst_button.configure(state=tk.DISABLED)
+        self.status_label.configure(text=f"Running Motor {motor} for {seconds:g} s...")
+
+    def burst_finished(self, job):
+        if job is not self.burst_job:
+            return False
+        self.burst_job = None
+        self.burst_button.configure(state=tk.NORMAL)
+        if job.state != "done":
+            self.status_label.configure(text=f"Burst {job.state}, not recorded")
+            return True
+        if self.scale is not None and hasattr(self.scale, "burst"):
+            self.scale.burst(job.seconds)
+        self.last_burst = (job.motor, job.seconds)
+        self.measured_entry.delete(0, tk.END)
+        self.status_label.configure(text=f"Motor {job.motor}: {job.seconds:g} s burst done, enter the ml poured")
+        return True
+
+    def read_scale(self):
+        try:
+            measured = self.scale.read_ml()
+        except Exception as e:
+            self.status_label.configure(text=f"Scale error: {e}")
+            return
+        self.measured_entry.delete(0, tk.END)
+        self.measured_entry.insert(0, f"{measured:.1f}")
+
+    def record(self):
+        if self.last_burst is None:
+            self.status_label.configure(text="Run a burst before recording")
+            return
+        try:
+            measured = float(self.measured_entry.get())
+        except ValueError:
+            self.status_label.configure(text="Measured volume must be a number")
+            return
+
+        motor, seconds = self.last_burst
+        self.samples.setdefault(motor, []).append((seconds, measured))
+        self.last_burst = None
+        count = len(self.samples[motor])
+        self.status_label.configure(text=f"Motor {motor}: {count} burst(s) recorded")
+
+    def fit_and_save(self):
+        motor = self.selected_motor()
+        if motor is None:
+            self.status_label.configure(text="Select a motor first")
+            return
+        try:
+            flow_rate, dead_time = fit_pump_curve(self.samples.get(motor, []))
+        except ValueError as e:
+            self.status_label.configure(text=f"Motor {motor}: {e}")
+            return
+
+        self.calibration.set_curve(motor, flow_rate, dead_time)
+        try:
+            self.calibration.save()
+        except OSError as e:
+            self.status_label.configure(text=f"Error saving calibration: {e}")
+            return
+        print(f"Motor {motor} calibrated: {flow_rate:.3f} ml/s, {dead_time:.2f} s dead time")
+        self.status_label.configure(text=f"Motor {motor}: {flow_rate:.3f} ml/s, {dead_time:.2f} s dead time (saved)")
+
+    def clear_motor(self):
+        motor = self.selected_motor()
+        if motor is not None:
+            self.samples.pop(motor, None)
+            self.status_label.configure(text=f"Motor {motor}: samples cleared")
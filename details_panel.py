@@ -0,0 +1,99 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class DetailsPanel:
+    # One details window built at startup and re-populated for every tap,
+    # instead of a new Toplevel full of widgets per drink. Ingredient text is
+    # formatted once per recipe and cached.
+    def __init__(self, root, geometry, on_order, with_slider=False, bg="#F8C471"):
+        self.on_order = on_order
+        self.with_slider = with_slider
+        self.cocktail = None
+        self.ingredient_text = {}
+
+        self.window = tk.Toplevel(root, bg=bg)
+        self.window.geometry(geometry)
+        self.window.withdraw()
+        # Closing the window only hides it so it can be shown again
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        # Displaying cocktail image
+        image_frame = tk.Frame(self.window, bg=bg)
+        image_frame.pack(pady=10)
+        self.image_label = tk.Label(image_frame)
+        self.image_label.pack()
+
+        # Displaying cocktail ingredients
+        ingredients_frame = tk.Frame(self.window, bg=bg)
+        ingredients_frame.pack(pady=10)
+        self.ingredients_label = tk.Label(ingredients_frame, bg=bg)
+        self.ingredients_label.pack()
+
+        if with_slider:
+            # Adding number of cocktails to cart
+            cart_frame = tk.Frame(self.window, bg=bg)
+            cart_frame.pack(pady=10)
+            cart_label = tk.Label(cart_frame, text="Slide->", bg=bg)
+            cart_label.pack(side=tk.LEFT)
+
+            self.cart_value = tk.IntVar(value=1)  #default cocktail count to one
+            cart_slider = ttk.Scale(cart_frame, from_=1, to=10, variable=self.cart_value, orient=tk.HORIZONTAL)
+            cart_slider.pack(side=tk.LEFT)
+
+            self.count_label = tk.Label(cart_frame, text="Order: 1", bg=bg)
+            self.count_label.pack(pady=5)
+
+            # Update the count label when the slider value changes
+            cart_slider.bind("<ButtonRelease-1>", self.update_cocktail_count)
+
+            # Several drinks go into one pitcher instead of a glass each
+            self.pitcher = tk.BooleanVar(value=False)
+            pitcher_check = tk.Checkbutton(self.window, text="Pour into a pitcher", variable=self.pitcher, bg=bg)
+            pitcher_check.pack()
+
+        # Order button
+        order_button = tk.Button(self.window, text="Press to order", command=self.order)
+        order_button.pack(pady=10)
+
+    def show(self, cocktail, ingredients, image, position=None):
+        text = self.ingredient_text.get(cocktail)
+        if text is None:
+            text = "\n".join(f"{ingredient.name}: {ingredient.quantity} ml" for ingredient in ingredients)
+            self.ingredient_text[cocktail] = text
+
+        self.cocktail = cocktail
+        self.window.title(cocktail)
+        self.image_label.configure(image=image)
+        self.image_label.image = image  # keeping the image alive if its tile scrolls away
+        self.ingredients_label.configure(text=text)
+        if self.with_slider:
+            self.cart_value.set(1)
+            self.count_label.configure(text="Order: 1")
+            self.pitcher.set(False)
+        if position is not None:
+            self.window.geometry(f"+{position[0]}+{position[1]}")
+
+        self.window.deiconify()
+        self.window.lift()
+
+    def update_image(self, cocktail, image):
+        if cocktail == self.cocktail:
+            self.image_label.configure(image=image)
+            self.image_label.image = image
+
+    def forget(self, cocktail):
+        # Dropping cached text after a recipe changed
+        self.ingredient_text.pop(cocktail, None)
+
+    def hide(self):
+        self.window.withdraw()
+
+    def update_cocktail_count(self, event):
+        self.count_label.configure(text=f"Order: {self.cart_value.get()}")
+
+    def order(self):
+        num_cocktails = self.cart_value.get() if self.with_slider else 1
+        pitcher = self.pitcher.get() if self.with_slider else False
+        self.hide()
+        self.on_order(self.cocktail, num_cocktails, pitcher)
@@ -0,0 +1,122 @@
+import base64
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import os
+import time
+import tkinter as tk
+
+from thumbnail_cache import ThumbnailCache
+
+# (connect, read) timeout for image downloads, in seconds
+request_timeout = (2, 5)
+
+# Number of images fetched and decoded at the same time
+max_workers = 4
+
+# How often the Tk side picks up finished images (ms)
+poll_interval_ms = 50
+
+# Colour of the tile shown until the real image arrives
+placeholder_color = "#FDEBD0"
+
+
+class ImageLoader:
+    # Fetches and resizes cocktail images on a thread pool. Finished images are
+    # handed back to the Tk thread, which is the only place PhotoImage objects
+    # may be created, so tiles can be shown at once and updated in place.
+    # requests and PIL are only imported by the first image that needs them:
+    # cached thumbnails and the placeholder are plain Tk images, which keeps
+    # them off the start-up path.
+    def __init__(self, root, size, max_workers=max_workers, cache=None, telemetry=None):
+        self.root = root
+        self.size = size
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.telemetry = telemetry
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-loader")
+        self.results = queue.Queue()
+        self.placeholder = tk.PhotoImage(width=size[0], height=size[1])
+        self.placeholder.put(placeholder_color, to=(0, 0, size[0], size[1]))
+        self.closed = False
+        self.root.after(poll_interval_ms, self._poll_results)
+
+    def load(self, key, local_img_path, image_url, on_loaded):
+        self.pool.submit(self._fetch, key, local_img_path, image_url, on_loaded)
+
+    def shutdown(self):
+        self.closed = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch(self, key, local_img_path, image_url, on_loaded):
+        started = time.perf_counter()
+        source = self._fetch_image(key, local_img_path, image_url, on_loaded)
+        if self.telemetry is not None:
+            self.telemetry.record("image_load", key=key, source=source,
+                                  ms=round((time.perf_counter() - started) * 1000, 2))
+
+    def _fetch_image(self, key, local_img_path, image_url, on_loaded):
+        # Returns where the image came from: "cache", "local", "url" or "failed"
+        image = None
+        source = "failed"
+        has_local = bool(local_img_path) and os.path.exists(local_img_path)
+
+        # A cached thumbnail needs no decoding, resizing or network access. It
+        # is kept under the local path whenever that file exists, even when the
+        # file was broken and the image came from image_url, so the next start
+        # finds it; replacing the file changes its mtime and so its cache entry.
+        cache_key = local_img_path if has_local else image_url
+        cached = self.cache.get(cache_key, self.size)
+        if cached is not None:
+            self.results.put((on_loaded, key, cached))
+            return "cache"
+
+        # Check if the image is available in the local "imgpath"
+        if has_local:
+            try:
+                from PIL import Image
+
+                image = self._resize(Image.open(local_img_path))
+                source = "local"
+                self.cache.put(cache_key, self.size, image)
+            except Exception as e:
+                print(f"Error loading image for {key} from local imgpath: {e}")
+
+        # Fall back to "image_url" if the local image is missing or broken
+        if image is None and image_url:
+            try:
+                import requests
+                from PIL import Image
+
+                response = requests.get(image_url, timeout=request_timeout)
+                response.raise_for_status()
+                image = self._resize(Image.open(BytesIO(response.content)))
+                source = "url"
+                self.cache.put(cache_key, self.size, image)
+            except Exception as e:
+                print(f"Error loading image for {key} from image_url: {e}")
+
+        if image is not None:
+            self.results.put((on_loaded, key, image))
+        return source
+
+    def _resize(self, image):
+        from PIL import Image
+
+        return image.resize(self.size, Image.BILINEAR)
+
+    def _poll_results(self):
+        while True:
+            try:
+                on_loaded, key, image = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(image, bytes):
+                # Cached PNGs are small enough for Tk to load natively
+                on_loaded(key, tk.PhotoImage(data=base64.b64encode(image)))
+            else:
+                # Only reached once a worker has decoded with PIL, so this import is free
+                from PIL import ImageTk
+
+                on_loaded(key, ImageTk.PhotoImage(image))
+        if not self.closed:
+            self.root.after(poll_interval_ms, self._poll_results)
@@ -0,0 +1,33 @@
+import tkinter as tk
+
+# Tick boxes per row
+columns = 4
+
+
+class IngredientFilter:
+    # One tick box per ingredient on the menu, all ticked to start with.
+    # Unticking one hides every drink that uses it, so guests can filter the
+    # menu with taps alone on a kiosk without a keyboard.
+    def __init__(self, parent, on_change, bg="#F8C471", columns=columns):
+        self.on_change = on_change
+        self.bg = bg
+        self.columns = columns
+        self.frame = tk.Frame(parent, bg=bg)
+        self.ticked = {}  # lower-case ingredient name -> BooleanVar
+
+    def set_ingredients(self, names):
+        # names maps lower-case ingredient names to how the menu spells them;
+        # boxes a guest unticked stay unticked when the menu is reloaded
+        unticked = self.excluded()
+        for widget in self.frame.winfo_children():
+            widget.destroy()
+        self.ticked = {}
+        for i, key in enumerate(sorted(names)):
+            ticked = tk.BooleanVar(value=key not in unticked)
+            box = tk.Checkbutton(self.frame, text=names[key], variable=ticked, bg=self.bg, anchor="w",
+                                 command=self.on_change)
+            box.grid(row=i // self.columns, column=i % self.columns, sticky="w")
+            self.ticked[key] = ticked
+
+    def excluded(self):
+        return {key for key, ticked in self.ticked.items() if not ticked.get()}
@@ -0,0 +1,209 @@
+# Reservoir levels per motor, kept as an append-only ledger of refills and
+# pours. Only motors that were filled at least once are tracked; the rest are
+# treated as bottomless so an empty ledger never blocks the menu.
+#
+# Stock is held for an order as soon as it is queued ("reserve"), so orders
+# further back can't count on the same liquid. The hold becomes a debit when
+# the order pours ("pour"), or goes back to stock if the order is cancelled
+# or fails to start ("release").
+#
+#   python inventory.py                 # show levels
+#   python inventory.py fill 3 750      # motor 3 now holds 750 ml
+#
+# A running kiosk picks up refills made this way on its next poll.
+
+import json
+import os
+import sys
+import threading
+
+# Ledger of refills and pours, replayed at start-up
+inventory_path = os.environ.get("CBR_INVENTORY", "inventory.jsonl")
+
+
+class OutOfStock(ValueError):
+    def __init__(self, message, short):
+        super().__init__(message)
+        self.short = short  # names of the ingredients that ran out
+
+
+class Inventory:
+    def __init__(self, path=inventory_path, compact=True):
+        self.path = path
+        self.lock = threading.Lock()
+        self.levels = {}  # motor -> ml left
+        self.reservations = {}  # order id -> [[motor, ml]] held for a queued order
+        self.held = {}  # motor -> ml held by all reservations
+        self.offset = 0  # how far into the ledger has been applied
+        self.changed = set()  # motors whose level moved since take_changes()
+        self._read_new()
+        if compact:
+            self._compact()
+
+    def _apply(self, entry):
+        if entry['op'] == "fill":
+            self.levels[entry['motor']] = entry['ml']
+            self.changed.add(entry['motor'])
+        elif entry['op'] == "reserve":
+            self.reservations[entry['id']] = entry['debits']
+            self._hold(entry['debits'], 1)
+        elif entry['op'] == "release":
+            self._hold(self.reservations.pop(entry['id'], []), -1)
+        elif entry['op'] == "pour":
+            debits = entry.get('debits')
+            if 'id' in entry:
+                debits = self.reservations.pop(entry['id'], [])
+                self._hold(debits, -1)
+            for motor, ml in debits:
+                if motor in self.levels:
+                    self.levels[motor] -= ml
+                    self.changed.add(motor)
+
+    def _hold(self, debits, sign):
+        for motor, ml in debits:
+            self.held[motor] = self.held.get(motor, 0) + sign * ml
+            self.changed.add(motor)
+
+    def _read_new(self):
+        # Applies whatever was appended to the ledger since the last read
+        try:
+            with open(self.path) as file:
+                file.seek(self.offset)
+                for line in file:
+                    if not line.endswith("\n"):
+                        break  # another process is still writing this line
+                    self.offset += len(line.encode())
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error reading inventory {self.path}: {e}")
+
+    def _compact(self):
+        # Compacting the ledger down to one fill line per tracked motor plus
+        # the stock still held for queued orders
+        lines = [self._entry("fill", motor=motor, ml=ml) for motor, ml in sorted(self.levels.items())]
+        lines += [self._entry("reserve", id=order_id, debits=debits)
+                  for order_id, debits in sorted(self.reservations.items())]
+        try:
+            with open(self.path + ".tmp", "w") as file:
+                file.writelines(lines)
+            os.replace(self.path + ".tmp", self.path)
+            self.offset = sum(len(line.encode()) for line in lines)
+        except OSError as e:
+            print(f"Error writing inventory {self.path}: {e}")
+
+    def _entry(self, op, **fields):
+        return json.dumps(dict(op=op, **fields)) + "\n"
+
+    def _journal(self, line):
+        try:
+            with open(self.path, "a") as file:
+                file.write(line)
+        except OSError as e:
+            print(f"Error writing inventory {self.path}: {e}")
+
+    def refresh(self):
+        with self.lock:
+            self._read_new()
+
+    def level(self, motor):
+        # None for an untracked motor
+        with self.lock:
+            return self.levels.get(motor)
+
+    def available(self, motor):
+        # What is left once queued orders have had their share; None for an untracked motor
+        with self.lock:
+            if motor not in self.levels:
+                return None
+            return self.levels[motor] - self.held.get(motor, 0)
+
+    def fill(self, motor, ml):
+        with self.lock:
+            self._journal(self._entry("fill", motor=motor, ml=ml))
+            self._read_new()
+
+    def _short(self, recipe, num_cocktails=1):
+        return [ingredient.name for ingredient in recipe.ingredients
+                if self.levels.get(ingredient.motor, float("inf")) - self.held.get(ingredient.motor, 0)
+                < ingredient.quantity * num_cocktails]
+
+    def short(self, recipe, num_cocktails=1):
+        # Ingredients whose reservoir can't cover num_cocktails drinks
+        with self.lock:
+            return self._short(recipe, num_cocktails)
+
+    def can_pour(self, recipe, num_cocktails=1):
+        with self.lock:
+            return not self._short(recipe, num_cocktails)
+
+    def reserve(self, order_id, recipe, num_cocktails):
+        # Holds the stock for a queued order, or raises OutOfStock if what is
+        # left after the orders ahead of it can't cover it
+        with self.lock:
+            self._read_new()
+            short = self._short(recipe, num_cocktails)
+            if short:
+                raise OutOfStock(f"not enough {', '.join(short)} left for {num_cocktails} {recipe.name}", short)
+            self._journal(self._entry("reserve", id=order_id,
+                                      debits=[[ingredient.motor, ingredient.quantity * num_cocktails]
+                                              for ingredient in recipe.ingredients]))
+            # Reading the ledger back also picks up lines other processes appended
+            self._read_new()
+
+    def commit(self, order_id):
+        # The order is pouring: its held stock leaves the reservoirs
+        with self.lock:
+            if order_id in self.reservations:
+                self._journal(self._entry("pour", id=order_id))
+                self._read_new()
+
+    def release(self, order_id):
+        # The order was cancelled or never started: its held stock is free again
+        with self.lock:
+            if order_id in self.reservations:
+                self._journal(self._entry("release", id=order_id))
+                self._read_new()
+
+    def reconcile(self, order_ids):
+        # Releases holds left by orders that are no longer queued (taken just
+        # before a crash, or lost with the order journal)
+        order_ids = set(order_ids)
+        with self.lock:
+            stale = [order_id for order_id in self.reservations if order_id not in order_ids]
+            for order_id in stale:
+                self._journal(self._entry("release", id=order_id))
+            if stale:
+                self._read_new()
+
+    def take_changes(self):
+        with self.lock:
+            changed = self.changed
+            self.changed = set()
+            return changed
+
+    def unavailable(self, store):
+        # Names of every recipe that can't be poured even once
+        with self.lock:
+            return {name for name in store if self._short(store[name])}
+
+
+def main():
+    # No compaction here: a running kiosk may be reading the same ledger
+    inventory = Inventory(compact=False)
+    if sys.argv[1:2] == ["fill"] and len(sys.argv) == 4:
+        inventory.fill(int(sys.argv[2]), float(sys.argv[3]))
+    elif sys.argv[1:]:
+        print("usage: python inventory.py [fill MOTOR ML]")
+        return
+    for motor, ml in sorted(inventory.levels.items()):
+        held = inventory.held.get(motor, 0)
+        print(f"Motor {motor}: {ml:.0f} ml" + (f" ({held:.0f} ml held for queued orders)" if held else ""))
+
+
+if __name__ == "__main__":
+    main()
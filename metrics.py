@@ -0,0 +1,151 @@
+import collections
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Port of the optional metrics endpoint; unset keeps the server off
+metrics_port = os.environ.get("CBR_METRICS_PORT")
+
+# Interface the endpoint binds to; the kiosk LAN by default
+metrics_host = os.environ.get("CBR_METRICS_HOST", "0.0.0.0")
+
+# Pour durations kept for the percentile summary
+duration_window = 1000
+
+# How often the Tk event loop is probed for lag (ms)
+lag_interval_ms = 250
+
+quantiles = (0.5, 0.9, 0.99)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class Metrics:
+    # Live performance counters fed from the telemetry stream. observe() runs
+    # on the telemetry writer thread, so the pour and Tk threads pay nothing.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.pours = collections.Counter()  # state -> pours
+        self.recent_pours = collections.deque()  # monotonic time of pours done in the last minute
+        self.durations = collections.deque(maxlen=duration_window)
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.relay_on_since = {}  # pin -> board clock time it switched on
+        self.relay_seconds = collections.Counter()  # pin -> seconds on, finished runs only
+        self.images = collections.Counter()  # source -> loads
+        self.lags = collections.deque(maxlen=duration_window)
+        self.max_lag = 0.0
+        self.gauges = []  # (name, help, callable)
+
+    def gauge(self, name, help_text, read):
+        self.gauges.append((name, help_text, read))
+
+    def observe(self, entry):
+        event = entry['event']
+        with self.lock:
+            if event == "relay":
+                if entry['on']:
+                    self.relay_on_since[entry['pin']] = entry['at']
+                elif entry['pin'] in self.relay_on_since:
+                    self.relay_seconds[entry['pin']] += entry['at'] - self.relay_on_since.pop(entry['pin'])
+            elif event == "pour_finished":
+                self.pours[entry['state']] += 1
+                if entry['state'] == "done":
+                    self.recent_pours.append(time.monotonic())
+                    self.durations.append(entry['seconds'])
+                    self.duration_sum += entry['seconds']
+                    self.duration_count += 1
+            elif event == "image_load":
+                self.images[entry['source']] += 1
+
+    def watch_event_loop(self, root, interval_ms=lag_interval_ms):
+        # A callback due in interval_ms that runs late measures how long the
+        # Tk thread was busy with something else
+        expected = time.monotonic() + interval_ms / 1000
+        root.after(interval_ms, self._lag_tick, root, interval_ms, expected)
+
+    def _lag_tick(self, root, interval_ms, expected):
+        lag = max(0.0, time.monotonic() - expected)
+        with self.lock:
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+        self.watch_event_loop(root, interval_ms)
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        with self.lock:
+            now = time.monotonic()
+            while self.recent_pours and self.recent_pours[0] < now - 60:
+                self.recent_pours.popleft()
+            uptime = now - self.started
+
+            metric("cbr_pours_total", "counter", "Pours finished, by final state",
+                   [(f'{{state="{state}"}}', count) for state, count in sorted(self.pours.items())])
+            metric("cbr_pours_per_minute", "gauge", "Pours completed in the last 60 s",
+                   [("", len(self.recent_pours))])
+            metric("cbr_pour_duration_seconds", "summary", "Time from pour start to finish",
+                   [(f'{{quantile="{q}"}}', percentile(self.durations, q)) for q in quantiles if self.durations]
+                   + [("_sum", self.duration_sum), ("_count", self.duration_count)])
+            metric("cbr_relay_on_seconds_total", "counter", "Seconds each pump relay has been on",
+                   [(f'{{pin="{pin}"}}', round(seconds, 3)) for pin, seconds in sorted(self.relay_seconds.items())])
+            metric("cbr_relay_duty_cycle", "gauge", "Share of uptime each pump relay has been on",
+                   [(f'{{pin="{pin}"}}', round(seconds / uptime, 5) if uptime else 0.0)
+                    for pin, seconds in sorted(self.relay_seconds.items())])
+            metric("cbr_image_loads_total", "counter", "Tile images loaded, by source",
+                   [(f'{{source="{source}"}}', count) for source, count in sorted(self.images.items())])
+            metric("cbr_event_loop_lag_seconds", "summary", "How late Tk timer callbacks run",
+                   [(f'{{quantile="{q}"}}', round(percentile(self.lags, q), 5)) for q in quantiles if self.lags])
+            metric("cbr_event_loop_lag_max_seconds", "gauge", "Worst Tk timer lag since start",
+                   [("", round(self.max_lag, 5))])
+
+        for name, help_text, read in self.gauges:
+            try:
+                metric(name, "gauge", help_text, [("", read())])
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def serve_metrics(metrics, port=metrics_port, host=metrics_host):
+    # Starts the endpoint on its own thread; returns the server, or None when disabled
+    if port is None or port == "":
+        return None
+    try:
+        server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    except (OSError, ValueError) as e:
+        print(f"Error starting metrics server on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Metrics at http://{host}:{server.server_port}/metrics")
+    return server
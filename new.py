@@ -1,7 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
-import RPi.GPIO as GPIO
-import time
+import os
+from calibration import CalibrationProfile
+from calibration_panel import CalibrationPanel
+from pour_engine import PourExecutor, PourJob
+from relay_board import SimulatedRelayBoard, open_board
+from relay_watchdog import RelayWatchdog
+from scale import SerialScale, SimulatedScale
 
 
 # Define the GPIO pins connected to the relay module for ingredients
@@ -11,18 +16,25 @@ import time
 #relay_pins = [40, 38, 36, 32, 37, 35, 33, 31, 23, 21]
 relay_pins = [23, 21, 19, 15, 13, 11, 7,5, 31,33,35] 
 
+# Per-pump flow curves; pumps without one use this flow rate (ml/s)
+flow_rate = 100
+calibration = CalibrationProfile.load(default_flow_rate=flow_rate)
+
+# Serial port of the calibration scale; without one, measured volumes are typed in
+# (the simulated board gets a simulated scale)
+scale_port = os.environ.get("CBR_SCALE_PORT")
+
 
 class IngredientPumpControl:
     def __init__(self, root):
         self.root = root
         self.root.title("Ingredient Pump Control")
 
-        # Initialize GPIO setup here
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setwarnings(False)
-        for pin in relay_pins:
-            GPIO.setup(pin, GPIO.OUT)
-            GPIO.output(pin, GPIO.HIGH)
+        # Relay module behind the board interface; CBR_GPIO=sim runs off-device
+        self.board = open_board(relay_pins)
+
+        # Independent guard that drops any relay left on past its deadline
+        self.relay_watchdog = RelayWatchdog(self.board.relay_off, self.board.clock)
 
         self.label = ttk.Label(root, text="Select Ingredient Motor:")
         self.label.pack(pady=10)
@@ -43,26 +55,58 @@ class IngredientPumpControl:
         self.start_button = ttk.Button(root, text="Start", command=self.start_pump)
         self.start_button.pack(pady=10)
 
+        self.status_label = ttk.Label(root, text="Ready")
+        self.status_label.pack()
+
+        # Pumps run on the pour executor's thread so the window stays responsive
+        self.pour_executor = PourExecutor(root, self.turn_on_relay, self.turn_off_relay,
+                                          on_done=self.pump_finished, clock=self.board.clock,
+                                          watchdog=self.relay_watchdog)
+
+        # Guided calibration of every pump in one session
+        # Made-up weights must never be fitted into the profile a real rig pours from
+        scale = None
+        if scale_port:
+            scale = SerialScale(scale_port)
+        elif isinstance(self.board, SimulatedRelayBoard):
+            scale = SimulatedScale()
+        self.calibration_panel = CalibrationPanel(root, relay_pins, self.ingredient_motor_dropdown,
+                                                  self.pour_executor, calibration, scale)
+
     def start_pump(self):
         motor_idx = self.ingredient_motor_dropdown.current()
         volume = int(self.volume_entry.get())
 
         if motor_idx >= 0 and 0 <= volume <= 100:
             motor_pin = relay_pins[motor_idx]
-            run_time = volume / 100  # Volume / flow rate
-
-            try:
-                GPIO.output(motor_pin, GPIO.LOW)
-                time.sleep(run_time)
-                GPIO.output(motor_pin, GPIO.HIGH)
-                print(f"Pumping {volume} ml from Motor {motor_idx + 1}")
-            except KeyboardInterrupt:
-                print("Process interrupted by the user.")
-            finally:
-                print("Pumping complete!")
+            run_time = calibration.run_time(motor_idx + 1, volume)  # Volume / calibrated flow rate
+
+            job = PourJob(f"Motor {motor_idx + 1}", 1, [(motor_pin, run_time)])
+            job.volume = volume
+            self.pour_executor.submit(job)
+            self.status_label.configure(text=f"Pumping {volume} ml from Motor {motor_idx + 1}...")
+
+    def pump_finished(self, job):
+        # Calibration bursts share the executor with manual pumping
+        if self.calibration_panel.burst_finished(job):
+            return
+        if job.state == "done":
+            print(f"Pumping {job.volume} ml from {job.cocktail_name}")
+            print("Pumping complete!")
+        else:
+            print(f"Pumping from {job.cocktail_name} {job.state}.")
+        self.status_label.configure(text=f"{job.cocktail_name}: pumping {job.state}")
+
+    def turn_on_relay(self, pin):
+        self.board.relay_on(pin)
+
+    def turn_off_relay(self, pin):
+        self.board.relay_off(pin)
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = IngredientPumpControl(root)
     root.mainloop()
-    GPIO.cleanup()
+    app.pour_executor.shutdown()
+    app.relay_watchdog.stop()
+    app.board.cleanup()
@@ -0,0 +1,348 @@
+# Local network order endpoint for phones and POS stand-ins, served by
+# asyncio on its own thread. Orders go into the same OrderQueue as taps on
+# the grid, so they pour through make_cocktails like any other order.
+#
+#   GET    /menu                      recipes and whether they can be poured
+#   POST   /orders                    {"cocktail": "AMF", "count": 2, "pitcher": false}
+#   GET    /orders/<id>               queue position, or pour progress
+#   DELETE /orders/<id>               cancel while still queued
+#   GET    /orders/<id>/stream        WebSocket pushing status until the pour ends
+#
+# Order ids just count up, so POST /orders also returns a random token and
+# the other /orders/<id> calls need it, as an X-Order-Token header or a
+# ?token= query parameter (browsers can't set headers on a WebSocket).
+# Nobody else on the venue Wi-Fi can follow or cancel a guest's order.
+
+import asyncio
+import base64
+import collections
+import hashlib
+import hmac
+import http
+import json
+import os
+import secrets
+import struct
+import threading
+import urllib.parse
+
+from inventory import OutOfStock
+
+# Port of the order endpoint; unset keeps it off
+api_port = os.environ.get("CBR_ORDER_API_PORT")
+
+# Interface it binds to; the kiosk LAN by default
+api_host = os.environ.get("CBR_ORDER_API_HOST", "0.0.0.0")
+
+# Orders are refused once the queue would take longer than this to pour (s)
+max_backlog_eta = 600
+
+# Most drinks in one order, same as the slider on the kiosk
+max_order_count = 10
+
+# How often a WebSocket stream checks for news (s)
+stream_interval = 0.25
+
+# Largest request body accepted (bytes)
+max_body = 16 * 1024
+
+# Order tokens remembered for status and cancel calls; the oldest go first
+max_tokens = 1000
+
+websocket_guid = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+finished_states = ("done", "short", "failed", "aborted")
+
+
+class RequestError(Exception):
+    def __init__(self, status, message, **fields):
+        super().__init__(message)
+        self.status = status
+        self.payload = dict(error=message, **fields)
+
+
+class OrderAPI:
+    # get_recipes() returns the current RecipeStore (it changes on hot reload);
+    # estimate(cocktail_name, num_cocktails, pitcher) returns the expected pour time in seconds.
+    def __init__(self, get_recipes, inventory, order_queue, scheduler, estimate, max_backlog_eta=max_backlog_eta,
+                 telemetry=None):
+        self.get_recipes = get_recipes
+        self.inventory = inventory
+        self.order_queue = order_queue
+        self.scheduler = scheduler
+        self.estimate = estimate
+        self.max_backlog_eta = max_backlog_eta
+        self.telemetry = telemetry
+        self.tokens = collections.OrderedDict()  # order id -> token handed to whoever placed it
+        self.loop = None
+        self.stopping = None
+        self.port = None
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self, host=api_host, port=api_port):
+        self.thread = threading.Thread(target=asyncio.run, args=(self._serve(host, int(port)),),
+                                       name="order-api", daemon=True)
+        self.thread.start()
+        self.ready.wait(5)
+        return self.port is not None
+
+    def stop(self, timeout=2):
+        if self.loop is not None and self.stopping is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    async def _serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, host, port)
+        except OSError as e:
+            print(f"Error starting order API on port {port}: {e}")
+            self.ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Order API at http://{host}:{self.port}/menu")
+        self.ready.set()
+        async with server:
+            await self.stopping.wait()
+
+    # Orders and status; plain methods, safe to call from any thread
+
+    def backlog_eta(self, upto=None):
+        # Seconds until the first `upto` queued orders (all of them by default)
+        # and everything already pouring are done
+        eta = 0.0
+        for job in list(self.scheduler.in_flight):
+            if not job.finished.is_set():
+                left = 1 - job.done / job.total if job.total else 1
+                eta += self._estimate(job.cocktail_name, job.num_cocktails, job.plan.vessel == "pitcher") * left
+        for order in self.order_queue.snapshot()[:upto]:
+            eta += self._estimate(order.cocktail_name, order.num_cocktails, order.pitcher)
+        return eta
+
+    def _estimate(self, cocktail_name, num_cocktails, pitcher=False):
+        try:
+            return self.estimate(cocktail_name, num_cocktails, pitcher)
+        except KeyError:
+            return 0.0  # recipe removed by a reload; the scheduler will drop the order
+
+    def menu(self):
+        recipes = self.get_recipes()
+        return {'recipes': [{'name': name,
+                             'available': self.inventory.can_pour(recipes[name]),
+                             'ingredients': [ingredient.name for ingredient in recipes[name].ingredients]}
+                            for name in recipes]}
+
+    def place(self, data):
+        if not isinstance(data, dict):
+            raise RequestError(400, "expected a JSON object")
+        cocktail_name = data.get('cocktail')
+        num_cocktails = data.get('count', 1)
+        pitcher = data.get('pitcher', False)
+        recipes = self.get_recipes()
+        if cocktail_name not in recipes:
+            raise RequestError(404, f"unknown cocktail {cocktail_name!r}")
+        if not isinstance(num_cocktails, int) or isinstance(num_cocktails, bool) \
+                or not 1 <= num_cocktails <= max_order_count:
+            raise RequestError(400, f"count must be a whole number from 1 to {max_order_count}")
+        if not isinstance(pitcher, bool):
+            raise RequestError(400, "pitcher must be true or false")
+
+        # Admission control: refuse rather than promise a drink in an hour
+        eta = self.backlog_eta() + self._estimate(cocktail_name, num_cocktails, pitcher)
+        if eta > self.max_backlog_eta:
+            raise RequestError(429, "the bar is too busy, try again later", eta=round(eta))
+
+        # The stock is held for the order as it is queued, same as a tap on the kiosk
+        recipe = recipes[cocktail_name]
+        try:
+            order = self.order_queue.put(cocktail_name, num_cocktails, pitcher,
+                                         admit=lambda queued: self.inventory.reserve(queued.order_id, recipe,
+                                                                                     num_cocktails))
+        except OutOfStock as e:
+            raise RequestError(409, "not enough left", short=e.short)
+        if self.telemetry is not None:
+            self.telemetry.record("order_placed", order=order.order_id, cocktail=cocktail_name,
+                                  count=num_cocktails, pitcher=pitcher, queue_depth=len(self.order_queue), source="api")
+        token = secrets.token_urlsafe(16)
+        self.tokens[order.order_id] = token
+        while len(self.tokens) > max_tokens:
+            self.tokens.popitem(last=False)
+        # The scheduler may already be handing the order over
+        status = self.status(order.order_id) or {'order_id': order.order_id, 'state': "queued"}
+        return dict(status, token=token)
+
+    def authorize(self, order_id, token):
+        # Orders placed on the kiosk, or before a restart, have no token and
+        # can't be reached over the network
+        expected = self.tokens.get(order_id)
+        if expected is None or not hmac.compare_digest(expected, token or ""):
+            raise RequestError(404, "no such order")
+
+    def status(self, order_id):
+        # None for an order that is neither queued nor known to the scheduler
+        position = self.order_queue.position(order_id)
+        if position is not None:
+            return {'order_id': order_id, 'state': "queued", 'position': position,
+                    'eta': round(self.backlog_eta(upto=position))}
+        outcome = self.scheduler.outcome(order_id)
+        if outcome is None:
+            return None
+        if isinstance(outcome, Exception):
+            return {'order_id': order_id, 'state': "failed", 'error': str(outcome)}
+        status = {'order_id': order_id, 'state': outcome.state, 'done': outcome.done, 'total': outcome.total,
+                  'station': outcome.station}
+        if outcome.flow_shortfalls:
+            # Pumps whose flow meter never reached the volume (empty bottle, blocked line)
+            status['short'] = [{'pin': pin, 'target_ml': round(target, 1), 'measured_ml': round(measured, 1)}
+                               for pin, (target, measured) in sorted(outcome.flow_shortfalls.items())]
+        return status
+
+    def cancel(self, order_id):
+        if not self.order_queue.cancel(order_id):
+            raise RequestError(409, "order is not waiting in the queue")
+        self.inventory.release(order_id)
+        return {'order_id': order_id, 'state': "cancelled"}
+
+    # HTTP and WebSocket plumbing
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, query, headers, body = await self._read_request(reader)
+            token = headers.get('x-order-token') or query.get('token')
+            if path.endswith("/stream") and headers.get('upgrade', "").lower() == "websocket":
+                order_id = self._order_id(path[:-len("/stream")])
+                self.authorize(order_id, token)
+                await self._stream(writer, headers, order_id)
+                return
+            status, payload = 200, self._route(method, path, body, token)
+            if method == "POST":
+                status = 201
+        except RequestError as e:
+            status, payload = e.status, e.payload
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            writer.close()
+            return
+        except Exception as e:
+            print(f"Error in order API: {e}")
+            status, payload = 500, {'error': "internal error"}
+        try:
+            await self._respond(writer, status, payload)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method, path, body, token=None):
+        if path == "/menu" and method == "GET":
+            return self.menu()
+        if path == "/orders" and method == "POST":
+            try:
+                data = json.loads(body or b"null")
+            except ValueError:
+                raise RequestError(400, "body is not valid JSON")
+            return self.place(data)
+        if path.startswith("/orders/"):
+            order_id = self._order_id(path)
+            self.authorize(order_id, token)
+            if method == "GET":
+                status = self.status(order_id)
+                if status is None:
+                    raise RequestError(404, f"unknown order {order_id}")
+                return status
+            if method == "DELETE":
+                return self.cancel(order_id)
+        raise RequestError(404, "no such endpoint")
+
+    def _order_id(self, path):
+        try:
+            return int(path.rstrip("/").rsplit("/", 1)[1])
+        except (IndexError, ValueError):
+            raise RequestError(404, "no such order")
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readuntil(b"\r\n")).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("malformed request line")
+        method = request_line[0].upper()
+        path, _, query = request_line[1].partition("?")
+        query = {name: values[0] for name, values in urllib.parse.parse_qs(query).items()}
+        headers = {}
+        while True:
+            line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > max_body:
+            raise RequestError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, query, headers, body
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def _stream(self, writer, headers, order_id):
+        key = headers.get('sec-websocket-key', "")
+        accept = base64.b64encode(hashlib.sha1((key + websocket_guid).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        last = None
+        missing = 0
+        try:
+            while not self.stopping.is_set():
+                status = self.status(order_id)
+                if status is None:
+                    # An order is briefly in neither place while the scheduler hands it over
+                    missing += 1
+                    if missing > 4:
+                        status = {'order_id': order_id, 'state': "unknown"}
+                else:
+                    missing = 0
+                if status is not None and status != last:
+                    writer.write(self._frame(json.dumps(status).encode()))
+                    await writer.drain()
+                    last = status
+                    if status['state'] in finished_states + ("unknown",):
+                        break
+                await asyncio.sleep(stream_interval)
+            writer.write(self._frame(b"", opcode=0x8))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _frame(self, payload, opcode=0x1):
+        # Unmasked, unfragmented server frame
+        if len(payload) < 126:
+            header = struct.pack("!BB", 0x80 | opcode, len(payload))
+        elif len(payload) < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, len(payload))
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, len(payload))
+        return header + payload
+
+
+def serve_order_api(get_recipes, inventory, order_queue, scheduler, estimate, port=api_port, host=api_host,
+                    telemetry=None):
+    # Starts the endpoint on its own thread; returns it, or None when disabled
+    if port is None or port == "":
+        return None
+    try:
+        port = int(port)
+    except ValueError:
+        print(f"Error starting order API: bad port {port!r}")
+        return None
+    api = OrderAPI(get_recipes, inventory, order_queue, scheduler, estimate, telemetry=telemetry)
+    if not api.start(host, port):
+        return None
+    return api
@@ -0,0 +1,216 @@
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+
+# Journal of queued orders, replayed after a restart
+queue_path = os.environ.get("CBR_ORDER_QUEUE", "orders.jsonl")
+
+# Orders whose job (or failure) the scheduler remembers for status lookups
+recent_limit = 500
+
+
+class Order:
+    __slots__ = ("order_id", "cocktail_name", "num_cocktails", "placed_at", "pitcher")
+
+    def __init__(self, order_id, cocktail_name, num_cocktails, placed_at=None, pitcher=False):
+        self.order_id = order_id
+        self.cocktail_name = cocktail_name
+        self.num_cocktails = num_cocktails
+        self.placed_at = placed_at if placed_at is not None else time.time()
+        self.pitcher = pitcher  # poured into one pitcher instead of a glass per drink
+
+
+def mergeable(first, order):
+    return order.cocktail_name == first.cocktail_name and not first.pitcher and not order.pitcher
+
+
+class OrderQueue:
+    # FIFO of guest orders, persisted as an append-only journal so queued
+    # orders survive a restart. Orders that were already pouring when the
+    # process died are not replayed: a half-poured glass must not be topped up.
+    def __init__(self, path=queue_path):
+        self.path = path
+        self.lock = threading.Condition()
+        self.pending = []
+        self.ids = itertools.count(1)
+        self.closed = False
+        self._replay()
+
+    def _replay(self):
+        orders = {}
+        last_id = 0
+        try:
+            with open(self.path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a power cut
+                    last_id = max(last_id, entry.get('id', 0))
+                    if entry['op'] == "add":
+                        orders[entry['id']] = Order(entry['id'], entry['cocktail'], entry['count'], entry['placed_at'],
+                                                    entry.get('pitcher', False))
+                    elif entry['op'] in ("take", "cancel"):
+                        orders.pop(entry['id'], None)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error reading order queue {self.path}: {e}")
+
+        self.pending = sorted(orders.values(), key=lambda order: order.order_id)
+        self.ids = itertools.count(last_id + 1)
+        if self.pending:
+            print(f"Restored {len(self.pending)} queued order(s)")
+
+        # Compacting the journal down to the orders still waiting
+        try:
+            with open(self.path, "w") as file:
+                for order in self.pending:
+                    file.write(self._entry("add", order))
+        except OSError as e:
+            print(f"Error writing order queue {self.path}: {e}")
+
+    def _entry(self, op, order):
+        entry = {'op': op, 'id': order.order_id}
+        if op == "add":
+            entry.update(cocktail=order.cocktail_name, count=order.num_cocktails, placed_at=order.placed_at,
+                         pitcher=order.pitcher)
+        return json.dumps(entry) + "\n"
+
+    def _journal(self, op, orders):
+        try:
+            with open(self.path, "a") as file:
+                file.writelines(self._entry(op, order) for order in orders)
+        except OSError as e:
+            print(f"Error writing order queue {self.path}: {e}")
+
+    def put(self, cocktail_name, num_cocktails, pitcher=False, admit=None):
+        # admit(order) runs before the order is queued and may raise to refuse
+        # it, e.g. when there isn't enough stock left to hold for it
+        with self.lock:
+            order = Order(next(self.ids), cocktail_name, num_cocktails, pitcher=pitcher)
+            if admit is not None:
+                admit(order)
+            self._journal("add", [order])
+            self.pending.append(order)
+            self.lock.notify_all()
+            return order
+
+    def take(self, merge=True, timeout=None):
+        # Blocks until an order is waiting. With merge, back-to-back glass
+        # orders of the same recipe at the head of the queue come out together;
+        # they still pour one drink per glass, with a swap pause between drinks.
+        # A pitcher belongs to one guest, so pitcher orders never merge.
+        with self.lock:
+            if not self.lock.wait_for(lambda: self.pending or self.closed, timeout):
+                return []
+            if self.closed:
+                return []
+            taken = [self.pending.pop(0)]
+            while merge and self.pending and mergeable(taken[0], self.pending[0]):
+                taken.append(self.pending.pop(0))
+            self._journal("take", taken)
+            self.lock.notify_all()
+            return taken
+
+    def cancel(self, order_id):
+        with self.lock:
+            for order in self.pending:
+                if order.order_id == order_id:
+                    self.pending.remove(order)
+                    self._journal("cancel", [order])
+                    self.lock.notify_all()
+                    return True
+            return False
+
+    def position(self, order_id):
+        # 1 for the next order to pour, None once it has left the queue
+        with self.lock:
+            for i, order in enumerate(self.pending):
+                if order.order_id == order_id:
+                    return i + 1
+            return None
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.pending)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
+
+
+class OrderScheduler:
+    # Drains the order queue on its own thread, keeping at most max_in_flight
+    # pours submitted at a time (one per glass station).
+    # make_job(cocktail_name, num_cocktails, orders) submits a pour and returns its job;
+    # on_failed(orders, error) is called (on the scheduler thread) when it raises.
+    def __init__(self, order_queue, make_job, merge=True, max_in_flight=1, telemetry=None, on_failed=None):
+        self.order_queue = order_queue
+        self.make_job = make_job
+        self.on_failed = on_failed
+        self.merge = merge
+        self.max_in_flight = max_in_flight
+        self.telemetry = telemetry
+        self.in_flight = []
+        self.recent = collections.OrderedDict()  # order_id -> job, or the error that stopped it
+        self.thread = threading.Thread(target=self._run, name="order-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.order_queue.close()
+
+    def outcome(self, order_id):
+        # The job pouring (or poured) an order that left the queue, the error
+        # that stopped it, or None if it is unknown
+        return self.recent.get(order_id)
+
+    def _remember(self, orders, outcome):
+        for order in orders:
+            self.recent[order.order_id] = outcome
+        while len(self.recent) > recent_limit:
+            self.recent.popitem(last=False)
+
+    def _wait_for_station(self):
+        # Orders stay in the queue (where they can still merge) until a station frees up
+        while True:
+            self.in_flight = [job for job in self.in_flight if not job.finished.is_set()]
+            if len(self.in_flight) < self.max_in_flight or self.order_queue.closed:
+                return
+            self.in_flight[0].finished.wait(0.05)
+
+    def _run(self):
+        while True:
+            self._wait_for_station()
+            orders = self.order_queue.take(merge=self.merge)
+            if not orders:
+                return
+            num_cocktails = sum(order.num_cocktails for order in orders)
+            if self.telemetry is not None:
+                taken_at = time.time()
+                for order in orders:
+                    self.telemetry.record("order_taken", order=order.order_id, cocktail=order.cocktail_name,
+                                          count=order.num_cocktails, queue_wait=taken_at - order.placed_at)
+            try:
+                job = self.make_job(orders[0].cocktail_name, num_cocktails, orders)
+            except Exception as e:
+                print(f"Error starting order #{orders[0].order_id}: {e}")
+                self._remember(orders, e)
+                if self.telemetry is not None:
+                    self.telemetry.record("order_failed", orders=[order.order_id for order in orders], error=str(e))
+                if self.on_failed is not None:
+                    try:
+                        self.on_failed(orders, e)
+                    except Exception as callback_error:
+                        print(f"Error reporting failed order #{orders[0].order_id}: {callback_error}")
+                continue
+            self._remember(orders, job)
+            self.in_flight.append(job)
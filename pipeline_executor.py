@@ -0,0 +1,247 @@
+import heapq
+import itertools
+import queue
+import threading
+
+from batch_planner import merge_run_times
+from flow_meter import timeout_factor
+from pour_engine import PourExecutor
+
+
+class Station:
+    __slots__ = ("index", "job", "fill", "pending", "running", "ready_at")
+
+    def __init__(self, index):
+        self.index = index
+        self.job = None
+        self.fill = 0
+        self.pending = []  # (motor_pin, run_time) not started yet in the current fill
+        self.running = set()  # pins pouring into this glass right now
+        self.ready_at = 0.0  # end of a vessel-swap pause
+
+
+class PipelinedPourExecutor(PourExecutor):
+    # Pours several orders side by side, one per glass station. Every motor is
+    # a resource: an ingredient starts as soon as its pump is free, so the
+    # next drink uses idle pumps while the current one is still pouring.
+    # Sequential jobs pour one ingredient at a time into their glass, at-once
+    # jobs pour every ingredient whose pump is free. All relay deadlines of
+    # all stations come from a single heap.
+    def __init__(self, root, relay_on, relay_off, stations=2, **kwargs):
+        self.stations = [Station(i) for i in range(stations)]
+        self.wake = threading.Event()
+        self.busy_pins = {}  # motor_pin -> station pouring with it
+        self.deadlines = []  # (deadline, seq, motor_pin, station index)
+        self.metered = {}  # motor_pin -> flow meter of running pumps that stop on volume
+        self.seq = itertools.count()
+        super().__init__(root, relay_on, relay_off, **kwargs)
+
+    def submit(self, job):
+        super().submit(job)
+        self.wake.set()
+        return job
+
+    def pending(self):
+        return self.jobs.qsize() + sum(1 for station in self.stations if station.job is not None)
+
+    def shutdown(self, timeout=5):
+        self.stop_event.set()
+        self.wake.set()
+        self.worker.join(timeout)
+
+    def can_start(self, motor_pin):
+        # Limits beyond "one pour per pump": the supply's power budget
+        return self._power_available()
+
+    def _worker_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                self.wake.clear()
+                self._load_stations()
+                self._start_ready()
+
+                timeout = self._next_wakeup()
+                if timeout is None:
+                    self.wake.wait()
+                elif timeout > 0:
+                    self.clock.wait(self.wake, timeout)
+                self._stop_due()
+        finally:
+            # Never leave a pump running, whatever happened above
+            self._switch_off(list(self.busy_pins))
+            self.busy_pins.clear()
+            self.metered.clear()
+            for station in self.stations:
+                if station.job is not None:
+                    self._finish(station, "aborted")
+
+    def _load_stations(self):
+        for station in self.stations:
+            if station.job is not None:
+                continue
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                continue
+            job.station = station.index
+            job.state = "pouring"
+            job.started_at = self.clock.now()
+            station.job = job
+            try:
+                self._begin_fill(station, 0)
+                self._pour_event("pour_started", job)
+                self._emit(self.on_start, job)
+                self._pause_station(station)
+            except Exception as e:
+                self._fail(station, e)
+
+    def _begin_fill(self, station, fill):
+        station.fill = fill
+        station.job.fill = fill
+        station.pending = merge_run_times(station.job.plan.fills[fill].run_times)
+        if station.job.mode == "atonce":
+            # Longest runs first, so the budget packs the slowest pumps in earliest
+            station.pending.sort(key=lambda item: item[1], reverse=True)
+
+    def _pause_station(self, station):
+        # Giving the guest time to swap the glass, or set the pitcher down
+        pause = station.job.plan.pause_before(station.fill)
+        if pause:
+            station.ready_at = self.clock.now() + pause
+            station.job.state = "swapping"
+            self._emit(self.on_progress, station.job)
+
+    def _start_ready(self):
+        now = self.clock.now()
+        # Oldest order first, so a busy pump always goes to the drink waiting longest
+        active = [station for station in self.stations if station.job is not None and station.ready_at <= now]
+        active.sort(key=lambda station: station.job.started_at)
+        for station in active:
+            try:
+                self._start_station(station)
+            except Exception as e:
+                self._fail(station, e)
+
+    def _start_station(self, station):
+        if station.job.state == "swapping":
+            station.job.state = "pouring"
+        for motor_pin, run_time in list(station.pending):
+            if station.job.mode != "atonce" and station.running:
+                break
+            if motor_pin in self.busy_pins or not self.can_start(motor_pin):
+                continue
+            station.pending.remove((motor_pin, run_time))
+            station.running.add(motor_pin)
+            self.busy_pins[motor_pin] = station.index
+            drinks = station.job.plan.fills[station.fill].drinks
+            meter = self._meter_for(station.job, motor_pin, drinks, self.wake)
+            if meter is None:
+                deadline = self._relay_on(motor_pin, run_time, station.job)
+            else:
+                deadline = self._relay_on(motor_pin, run_time, station.job, limit=run_time * timeout_factor)
+                self.metered[motor_pin] = meter
+            heapq.heappush(self.deadlines, (deadline, next(self.seq), motor_pin, station.index))
+        if not station.pending and not station.running:
+            # A fill with nothing to pour
+            self._fill_done(station)
+
+    def _next_wakeup(self):
+        if any(meter.reached.is_set() for meter in self.metered.values()):
+            return 0.0
+        now = self.clock.now()
+        wakeups = [deadline for deadline, _, _, _ in self.deadlines[:1]]
+        wakeups += [station.ready_at for station in self.stations
+                    if station.job is not None and station.ready_at > now]
+        waiting = any(station.pending for station in self.stations if station.job is not None)
+        if waiting and self.power_budget is not None:
+            next_start = self.power_budget.next_start_at(now)
+            if next_start is not None and next_start > now:
+                wakeups.append(next_start)
+        if wakeups:
+            return max(0.0, min(wakeups) - now)
+        if waiting:
+            # Waiting on a pump another limit is holding back; poll again shortly
+            return 0.01
+        return None
+
+    def _stop_due(self):
+        # Metered pumps that have their volume stop first, whatever their deadline
+        reached = [entry for entry in self.deadlines
+                   if entry[2] in self.metered and self.metered[entry[2]].reached.is_set()]
+        if reached:
+            self.deadlines = [entry for entry in self.deadlines if entry not in reached]
+            heapq.heapify(self.deadlines)
+        for entry in reached:
+            self._stop_pin(*entry)
+        while self.deadlines and self.deadlines[0][0] <= self.clock.now():
+            self._stop_pin(*heapq.heappop(self.deadlines))
+
+    def _stop_pin(self, deadline, seq, motor_pin, index):
+        station = self.stations[index]
+        if self.busy_pins.get(motor_pin) != index:
+            return  # the station failed and already switched its pins off
+        try:
+            self._relay_off(motor_pin)
+            del self.busy_pins[motor_pin]
+
+            job = station.job
+            meter = self.metered.pop(motor_pin, None)
+            if meter is not None:
+                self._check_flow(job, motor_pin, meter)
+            else:
+                jitter = self.clock.now() - deadline
+                job.stop_jitter[motor_pin] = max(jitter, job.stop_jitter.get(motor_pin, jitter))
+            station.running.discard(motor_pin)
+            self._step_done(job)
+
+            if not station.pending and not station.running:
+                self._fill_done(station)
+        except Exception as e:
+            self._fail(station, e)
+
+    def _fill_done(self, station):
+        if station.fill + 1 < len(station.job.plan.fills):
+            self._begin_fill(station, station.fill + 1)
+            self._pause_station(station)
+        else:
+            self._finish(station, "short" if station.job.flow_shortfalls else "done")
+
+    def _fail(self, station, error):
+        # Same as PourExecutor._run_job: this station's pumps go off and its
+        # job fails, while the other stations keep pouring
+        job = station.job
+        job.error = error
+        print(f"Error while pouring {job.cocktail_name}: {error}")
+        pins = [motor_pin for motor_pin, index in self.busy_pins.items() if index == station.index]
+        self._switch_off(pins)
+        for motor_pin in pins:
+            del self.busy_pins[motor_pin]
+            self.metered.pop(motor_pin, None)
+        self.deadlines = [entry for entry in self.deadlines if entry[3] != station.index]
+        heapq.heapify(self.deadlines)
+        self._finish(station, "failed")
+
+    def _finish(self, station, state):
+        job = station.job
+        job.state = state
+        job.finished_at = self.clock.now()
+        station.job = None
+        station.pending = []
+        station.running = set()
+        station.ready_at = 0.0
+        try:
+            self._pour_event("pour_finished", job)
+            self._emit(self.on_done, job)
+        except Exception as e:
+            print(f"Error finishing {job.cocktail_name}: {e}")
+        finally:
+            job.finished.set()
+
+
+def make_executor(root, relay_on, relay_off, stations=1, **kwargs):
+    # One glass station pours order by order; more stations pipeline orders
+    if stations > 1:
+        return PipelinedPourExecutor(root, relay_on, relay_off, stations=stations, **kwargs)
+    return PourExecutor(root, relay_on, relay_off, **kwargs)
@@ -0,0 +1,342 @@
+import heapq
+import queue
+import threading
+
+from batch_planner import single_fill
+from flow_meter import timeout_factor
+from relay_board import RealClock
+
+# How often the Tk side drains progress events from the pour thread (ms)
+poll_interval_ms = 50
+
+
+class PourJob:
+    def __init__(self, cocktail_name, num_cocktails, run_times, mode="sequential", plan=None, orders=None,
+                 volumes=None):
+        self.cocktail_name = cocktail_name
+        self.num_cocktails = num_cocktails
+        self.run_times = run_times  # list of (motor_pin, run_time) for one drink
+        self.volumes = volumes if volumes is not None else {}  # motor_pin -> ml for one drink, for metered pumps
+        self.mode = mode  # "sequential" or "atonce"
+        self.plan = plan if plan is not None else single_fill(run_times)
+        self.fill = 0
+        self.done = 0
+        self.total = self.plan.steps()
+        self.orders = orders if orders is not None else []  # guest orders poured by this job
+        self.station = None  # glass station, when several orders pour side by side
+        self.state = "queued"
+        self.error = None
+        self.finished = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.stop_jitter = {}  # motor_pin -> seconds between deadline and actual relay drop
+        self.on_times = {}  # motor_pin -> [(planned, achieved)] seconds for every run of that pump
+        self.flow_shortfalls = {}  # motor_pin -> (target, measured) ml of metered runs that timed out
+
+
+class PourExecutor:
+    # Runs relay timing on its own thread so the Tk mainloop never sleeps.
+    # Progress is handed back through a queue that the GUI thread drains with
+    # root.after, so callbacks always run on the Tk thread. Without a root
+    # (headless runs) callbacks are called straight from the pour thread.
+    # An optional power_budget (see power_budget.py) caps how many pumps run
+    # together and staggers their starts; an optional telemetry log gets
+    # every relay transition and pour; an optional relay watchdog is told
+    # every relay's deadline and drops the relay if this thread never does.
+    # Pumps with a flow meter (motor_pin -> FlowMeter, see flow_meter.py)
+    # stop on measured volume when the job knows their ml, and fall back to
+    # timeout_factor times their calibrated run time if the volume never comes;
+    # a job with such a shortfall ends "short" rather than "done".
+    def __init__(self, root, relay_on, relay_off, on_start=None, on_progress=None, on_done=None, clock=None,
+                 power_budget=None, telemetry=None, watchdog=None, flow_meters=None):
+        self.root = root
+        self.relay_on = relay_on
+        self.relay_off = relay_off
+        self.clock = clock if clock is not None else RealClock()
+        self.power_budget = power_budget
+        self.telemetry = telemetry
+        self.watchdog = watchdog
+        self.watchdog_tokens = {}  # motor_pin -> token of the watchdog arm for its current pour
+        self.flow_meters = flow_meters if flow_meters is not None else {}
+        self.flow_wake = threading.Event()  # set by a meter reaching its volume, and by shutdown
+        self.running = {}  # motor_pin -> (switched on at, planned run time, job)
+        self.on_start = on_start
+        self.on_progress = on_progress
+        self.on_done = on_done
+
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self.stop_event = threading.Event()
+        self.current_job = None
+
+        self.worker = threading.Thread(target=self._worker_loop, name="pour-executor", daemon=True)
+        self.worker.start()
+        if self.root is not None:
+            self.root.after(poll_interval_ms, self._poll_events)
+
+    def submit(self, job):
+        self.jobs.put(job)
+        return job
+
+    def pending(self):
+        return self.jobs.qsize() + (1 if self.current_job is not None else 0)
+
+    def shutdown(self, timeout=5):
+        # Aborts the pour in progress; the worker switches every relay off on the way out
+        self.stop_event.set()
+        self.flow_wake.set()
+        self.jobs.put(None)
+        self.worker.join(timeout)
+
+    def _worker_loop(self):
+        while not self.stop_event.is_set():
+            job = self.jobs.get()
+            if job is None:
+                break
+            self.current_job = job
+            try:
+                self._run_job(job)
+            except Exception as e:
+                # A broken job must not take the executor (and every later order) down with it
+                print(f"Error in pour executor: {e}")
+            self.current_job = None
+
+    def _run_job(self, job):
+        job.state = "pouring"
+        job.started_at = self.clock.now()
+        self._pour_event("pour_started", job)
+        self._emit(self.on_start, job)
+        try:
+            self._pour_plan(job)
+            if self.stop_event.is_set():
+                job.state = "aborted"
+            else:
+                job.state = "short" if job.flow_shortfalls else "done"
+        except Exception as e:
+            job.state = "failed"
+            job.error = e
+            print(f"Error while pouring {job.cocktail_name}: {e}")
+        finally:
+            # Never leave a pump running, whatever happened above
+            self._switch_off(motor_pin for motor_pin, _ in job.run_times)
+            job.finished_at = self.clock.now()
+            try:
+                self._pour_event("pour_finished", job)
+                self._emit(self.on_done, job)
+            finally:
+                job.finished.set()
+
+    def _pour_plan(self, job):
+        fills = job.plan.fills
+        if job.mode == "atonce":
+            job.total = sum(len(dict(fill.run_times)) for fill in fills)
+        for i, fill in enumerate(fills):
+            job.fill = i
+            pause = job.plan.pause_before(i)
+            if pause:
+                # Giving the guest time to swap the glass, or set the pitcher down
+                job.state = "swapping"
+                self._emit(self.on_progress, job)
+                if self.clock.wait(self.stop_event, pause):
+                    return
+                job.state = "pouring"
+            if job.mode == "atonce":
+                self._pour_at_once(job, fill.run_times, fill.drinks)
+            else:
+                self._pour_sequential(job, fill.run_times, fill.drinks)
+            if self.stop_event.is_set():
+                return
+
+    def _pour_sequential(self, job, run_times, drinks=1):
+        for motor_pin, run_time in run_times:
+            self.flow_wake.clear()
+            if self.stop_event.is_set():
+                return
+            meter = self._meter_for(job, motor_pin, drinks, self.flow_wake)
+            if meter is None:
+                self._relay_on(motor_pin, run_time, job)
+                self.clock.wait(self.stop_event, run_time)
+                self._relay_off(motor_pin)
+            else:
+                self._relay_on(motor_pin, run_time, job, limit=run_time * timeout_factor)
+                self.clock.wait(self.flow_wake, run_time * timeout_factor)
+                self._relay_off(motor_pin)
+                self._check_flow(job, motor_pin, meter)
+            self._step_done(job)
+
+    def _pour_at_once(self, job, run_times, drinks=1):
+        # Same pin listed twice in a recipe pours both volumes in one run
+        durations = {}
+        for motor_pin, run_time in run_times:
+            durations[motor_pin] = durations.get(motor_pin, 0) + run_time
+
+        # Pumps start as soon as the power budget allows, longest run first so
+        # the last pump to finish gets going earliest. Each one is dropped at
+        # its own start + run time, driven from a single heap of deadlines.
+        # Metered pumps also stop early, as soon as their meter has the volume.
+        waiting = sorted(durations.items(), key=lambda item: item[1], reverse=True)
+        deadlines = []
+        metered = {}  # motor_pin -> flow meter of running pumps that stop on volume
+        while waiting or deadlines:
+            self.flow_wake.clear()
+            if self.stop_event.is_set():
+                return
+            while waiting and self._power_available():
+                motor_pin, run_time = waiting.pop(0)
+                meter = self._meter_for(job, motor_pin, drinks, self.flow_wake)
+                if meter is None:
+                    deadline = self._relay_on(motor_pin, run_time, job)
+                else:
+                    deadline = self._relay_on(motor_pin, run_time, job, limit=run_time * timeout_factor)
+                    metered[motor_pin] = meter
+                heapq.heappush(deadlines, (deadline, motor_pin))
+
+            wakeups = [deadlines[0][0]] if deadlines else []
+            if waiting and self.power_budget is not None:
+                next_start = self.power_budget.next_start_at(self.clock.now())
+                if next_start is not None:
+                    wakeups.append(next_start)
+            remaining = min(wakeups) - self.clock.now()
+            if any(meter.reached.is_set() for meter in metered.values()):
+                remaining = 0
+            if remaining > 0:
+                self.clock.wait(self.flow_wake, remaining)
+            if self.stop_event.is_set():
+                return
+
+            for motor_pin, meter in list(metered.items()):
+                if meter.reached.is_set():
+                    deadlines = [entry for entry in deadlines if entry[1] != motor_pin]
+                    heapq.heapify(deadlines)
+                    del metered[motor_pin]
+                    self._relay_off(motor_pin)
+                    self._check_flow(job, motor_pin, meter)
+                    self._step_done(job)
+
+            while deadlines and deadlines[0][0] <= self.clock.now():
+                deadline, motor_pin = heapq.heappop(deadlines)
+                self._relay_off(motor_pin)
+                if motor_pin in metered:
+                    self._check_flow(job, motor_pin, metered.pop(motor_pin))
+                else:
+                    jitter = self.clock.now() - deadline
+                    job.stop_jitter[motor_pin] = max(jitter, job.stop_jitter.get(motor_pin, jitter))
+                self._step_done(job)
+
+    def _power_available(self):
+        return self.power_budget is None or self.power_budget.can_start(self.clock.now())
+
+    def _meter_for(self, job, motor_pin, drinks, wake):
+        # The pump's flow meter, primed for this run, when it should stop on volume
+        meter = self.flow_meters.get(motor_pin)
+        if meter is None or motor_pin not in job.volumes:
+            return None
+        meter.expect(job.volumes[motor_pin] * drinks, wake)
+        return meter
+
+    def _check_flow(self, job, motor_pin, meter):
+        # Called once a metered pump is off; a run that hit its time limit short
+        # of the volume means an empty bottle, a blocked line or a dead sensor
+        target, measured = meter.target_ml(), meter.ml()
+        if self.telemetry is not None:
+            self.telemetry.record("flow", pin=motor_pin, cocktail=job.cocktail_name, target_ml=round(target, 2),
+                                  measured_ml=round(measured, 2))
+        if meter.reached.is_set() or self.stop_event.is_set():
+            return
+        job.flow_shortfalls[motor_pin] = (target, measured)
+        print(f"Error: pump on pin {motor_pin} poured {measured:.1f} of {target:.1f} ml before timing out")
+
+    def _relay_on(self, motor_pin, run_time, job, limit=None):
+        # Returns the deadline the relay has to be off by: run_time after now,
+        # or limit after now for a pump that stops on its flow meter. on_times
+        # keep comparing against run_time, which shows calibration drift.
+        if self.power_budget is not None:
+            self.power_budget.relay_on(motor_pin, self.clock.now())
+        try:
+            self.relay_on(motor_pin)
+        except Exception:
+            if self.power_budget is not None:
+                self.power_budget.relay_off(motor_pin)
+            raise
+        now = self.clock.now()
+        deadline = now + (limit if limit is not None else run_time)
+        self.running[motor_pin] = (now, run_time, job)
+        if self.watchdog is not None:
+            self.watchdog_tokens[motor_pin] = self.watchdog.arm(motor_pin, deadline)
+        if self.telemetry is not None:
+            self.telemetry.record("relay", pin=motor_pin, on=True, at=now)
+        return deadline
+
+    def _relay_off(self, motor_pin):
+        self.relay_off(motor_pin)
+        now = self.clock.now()
+        if self.watchdog is not None:
+            self.watchdog.disarm(motor_pin, self.watchdog_tokens.pop(motor_pin, None))
+        if self.power_budget is not None:
+            self.power_budget.relay_off(motor_pin)
+
+        # Achieved against planned on-time, for every ingredient poured. A pin
+        # that wasn't running (the end-of-job sweep) made no transition to log.
+        started = self.running.pop(motor_pin, None)
+        if started is None:
+            return
+        started_at, planned, job = started
+        job.on_times.setdefault(motor_pin, []).append((planned, now - started_at))
+        if self.telemetry is not None:
+            self.telemetry.record("relay", pin=motor_pin, on=False, at=now, cocktail=job.cocktail_name,
+                                  planned_ms=round(planned * 1000, 3), achieved_ms=round((now - started_at) * 1000, 3))
+
+    def _switch_off(self, motor_pins):
+        # Each pin gets its own attempt, so one failing relay can't leave the others on
+        for motor_pin in motor_pins:
+            try:
+                self._relay_off(motor_pin)
+            except Exception as e:
+                print(f"Error switching off relay {motor_pin}: {e}")
+
+    def _pour_event(self, event, job):
+        if self.telemetry is None:
+            return
+        fields = dict(cocktail=job.cocktail_name, count=job.num_cocktails, mode=job.mode, station=job.station,
+                      orders=[order.order_id for order in job.orders], state=job.state)
+        if job.finished_at is not None:
+            fields.update(seconds=job.finished_at - job.started_at,
+                          worst_jitter_ms=max(job.stop_jitter.values(), default=0.0) * 1000)
+        self.telemetry.record(event, **fields)
+
+    def _step_done(self, job):
+        job.done += 1
+        self._emit(self.on_progress, job)
+
+    def _emit(self, callback, job):
+        if self.root is None:
+            if callback is not None:
+                callback(job)
+        else:
+            self.events.put((callback, job))
+
+    def _poll_events(self):
+        while True:
+            try:
+                callback, job = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if callback is not None:
+                callback(job)
+        if not self.stop_event.is_set():
+            self.root.after(poll_interval_ms, self._poll_events)
+
+
+def jitter_report(job):
+    # Summary of how late each relay was dropped compared to its deadline,
+    # and how far on-times strayed from the plan
+    if not job.stop_jitter:
+        return "no relay deadlines recorded"
+    worst_pin = max(job.stop_jitter, key=job.stop_jitter.get)
+    mean = sum(job.stop_jitter.values()) / len(job.stop_jitter)
+    errors = [achieved - planned for runs in job.on_times.values() for planned, achieved in runs]
+    worst_error = max(errors, key=abs, default=0.0)
+    return (f"drink time {job.finished_at - job.started_at:.3f}s, "
+            f"stop jitter mean {mean * 1000:.1f}ms, "
+            f"worst {job.stop_jitter[worst_pin] * 1000:.1f}ms on pin {worst_pin}, "
+            f"worst on-time error {worst_error * 1000:+.1f}ms")
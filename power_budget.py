@@ -0,0 +1,66 @@
+# Current model of the 12 V pump supply. A pump draws inrush_amps for
+# inrush_time after it switches on and running_amps after that; a pump may
+# only start while the total, including its own inrush, stays within
+# supply_amps. With the defaults four pumps can run together and starts are
+# staggered so no two inrush peaks overlap past the limit.
+
+# Continuous rating of the pump supply (A)
+supply_amps = 5.0
+
+# Current of one pump once it is running (A)
+running_amps = 0.8
+
+# Peak current of one pump while it spins up (A), and for how long (s)
+inrush_amps = 2.0
+inrush_time = 0.2
+
+# Hard cap on pumps running together, on top of the current limit (None: no cap)
+max_concurrent_pumps = 4
+
+
+class PowerBudget:
+    def __init__(self, supply_amps=supply_amps, running_amps=running_amps, inrush_amps=inrush_amps,
+                 inrush_time=inrush_time, max_concurrent=max_concurrent_pumps):
+        if inrush_amps > supply_amps or (max_concurrent is not None and max_concurrent < 1):
+            raise ValueError("power budget does not allow even one pump to start")
+        self.supply_amps = supply_amps
+        self.running_amps = running_amps
+        self.inrush_amps = inrush_amps
+        self.inrush_time = inrush_time
+        self.max_concurrent = max_concurrent
+        self.started = {}  # motor_pin -> time it switched on
+        self.peak_amps = 0.0
+
+    def draw(self, now):
+        return sum(self.inrush_amps if now - started < self.inrush_time else self.running_amps
+                   for started in self.started.values())
+
+    def can_start(self, now):
+        if self.max_concurrent is not None and len(self.started) >= self.max_concurrent:
+            return False
+        return self.draw(now) + self.inrush_amps <= self.supply_amps
+
+    def next_start_at(self, now):
+        # Earliest time a start could fit without a pump stopping first, or None
+        if self.can_start(now):
+            return now
+        if self.max_concurrent is not None and len(self.started) >= self.max_concurrent:
+            return None
+        settling = sorted(started + self.inrush_time for started in self.started.values()
+                          if now - started < self.inrush_time)
+        for at in settling:
+            if self.can_start(at):
+                return at
+        return None
+
+    def concurrency_limit(self):
+        # Pumps that can end up running together once every inrush has settled
+        fit = int((self.supply_amps - self.inrush_amps) // self.running_amps) + 1
+        return fit if self.max_concurrent is None else min(fit, self.max_concurrent)
+
+    def relay_on(self, motor_pin, now):
+        self.started[motor_pin] = now
+        self.peak_amps = max(self.peak_amps, self.draw(now))
+
+    def relay_off(self, motor_pin):
+        self.started.pop(motor_pin, None)
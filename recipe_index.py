@@ -0,0 +1,107 @@
+import re
+
+# Splits names into the words a guest might start typing
+word_pattern = re.compile(r"[a-z0-9']+")
+
+
+def words(text):
+    return word_pattern.findall(text.lower())
+
+
+class TrieNode:
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()  # every recipe with a word under this prefix
+
+
+class PrefixTrie:
+    # Each node keeps the recipes below it, so a prefix lookup costs the
+    # length of the prefix rather than the size of the menu
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, word, name):
+        node = self.root
+        node.names.add(name)
+        for char in word:
+            node = node.children.setdefault(char, TrieNode())
+            node.names.add(name)
+
+    def lookup(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.names
+
+
+class RecipeIndex:
+    # Inverted indexes over a recipe store for the search bar. A query is a
+    # comma-separated list of clauses that must all hold:
+    #   gin           recipe name or an ingredient starts with "gin"
+    #   no tequila    no ingredient starting with "tequila"
+    #   motor 3       pours from motor 3
+    # Ingredients unticked in the filter bar are passed to search() separately.
+    def __init__(self, store):
+        self.store = store
+        self.order = {name: i for i, name in enumerate(store)}
+        self.by_ingredient = {}  # lower-case ingredient name -> recipe names
+        self.ingredient_names = {}  # lower-case ingredient name -> as the menu spells it
+        self.name_trie = PrefixTrie()
+        self.ingredient_trie = PrefixTrie()
+
+        for name in store:
+            for word in words(name):
+                self.name_trie.insert(word, name)
+            for ingredient in store[name].ingredients:
+                ingredient_name = (ingredient.name or "").lower()
+                self.by_ingredient.setdefault(ingredient_name, set()).add(name)
+                self.ingredient_names.setdefault(ingredient_name, (ingredient.name or "").strip())
+                for word in words(ingredient_name):
+                    self.ingredient_trie.insert(word, name)
+
+    def with_ingredient(self, text):
+        # Exact ingredient names plus any ingredient with words starting with
+        # the text, so typing another letter can only narrow the result
+        matched = None
+        for word in words(text):
+            found = self.ingredient_trie.lookup(word)
+            matched = found if matched is None else matched & found
+        return self.by_ingredient.get(text, set()) | (matched or set())
+
+    def matching(self, text):
+        matched = None
+        for word in words(text):
+            found = self.name_trie.lookup(word)
+            matched = found if matched is None else matched & found
+        return (matched or set()) | self.with_ingredient(text)
+
+    def search(self, query, excluded_ingredients=()):
+        # Names matching every clause and using none of excluded_ingredients
+        # (lower-case ingredient names), in menu order
+        included = None
+        excluded = set()
+        for ingredient_name in excluded_ingredients:
+            excluded |= self.by_ingredient.get(ingredient_name, set())
+        for clause in query.lower().split(","):
+            clause = clause.strip()
+            if not clause:
+                continue
+            if clause.startswith("no "):
+                excluded |= self.with_ingredient(clause[3:].strip())
+                continue
+            if clause.startswith("motor "):
+                try:
+                    found = self.store.recipes_using([int(clause[6:])])
+                except ValueError:
+                    found = set()
+            else:
+                found = self.matching(clause)
+            included = found if included is None else included & found
+
+        if included is None:
+            return [name for name in self.store if name not in excluded]
+        return sorted(included - excluded, key=self.order.get)
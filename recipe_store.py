@@ -0,0 +1,136 @@
+import json
+
+from calibration import CalibrationProfile
+
+
+class Ingredient:
+    __slots__ = ("name", "quantity", "motor", "pin")
+
+    def __init__(self, name, quantity, motor, pin):
+        self.name = name
+        self.quantity = quantity
+        self.motor = motor
+        self.pin = pin
+
+
+class Recipe:
+    __slots__ = ("name", "image_url", "imgpath", "ingredients", "run_times", "dead_times", "drink_ml",
+                 "volumes")
+
+    def __init__(self, name, image_url, imgpath, ingredients, run_times, dead_times):
+        self.name = name
+        self.image_url = image_url
+        self.imgpath = imgpath
+        self.ingredients = ingredients
+        self.run_times = run_times  # tuple of (motor_pin, run_time), ready for the pour engine
+        self.dead_times = dead_times  # motor_pin -> priming time included in its run_time
+        self.drink_ml = sum(ingredient.quantity for ingredient in ingredients)
+        self.volumes = {ingredient.pin: ingredient.quantity for ingredient in ingredients}  # motor_pin -> ml per drink
+
+    def signature(self):
+        # Everything that affects the tile, the details panel or the pour
+        return (self.image_url, self.imgpath, self.run_times,
+                tuple((ingredient.name, ingredient.quantity, ingredient.motor) for ingredient in self.ingredients))
+
+
+def compile_recipe(name, data, relay_pins, motor_mapping, calibration):
+    # Raises ValueError describing the first problem found in the recipe
+    ingredients = []
+    used_motors = {}
+    for ingredient in data.get('ingredients', []):
+        motor = ingredient.get('motor')
+        quantity = ingredient.get('quantity')
+        if not isinstance(quantity, (int, float)) or quantity <= 0:
+            raise ValueError(f"{ingredient.get('name')} has an invalid quantity {quantity!r}")
+
+        # Motor indices from JSON go through motor_mapping when the rig has one
+        pin_idx = motor_mapping.get(motor) if motor_mapping is not None else motor
+        if not isinstance(pin_idx, int) or not 0 <= pin_idx < len(relay_pins):
+            raise ValueError(f"{ingredient.get('name')} uses motor {motor!r}, which has no relay pin")
+
+        if motor in used_motors:
+            raise ValueError(f"{used_motors[motor]} and {ingredient.get('name')} both map to motor {motor}")
+        used_motors[motor] = ingredient.get('name')
+
+        ingredients.append(Ingredient(ingredient.get('name'), quantity, motor, relay_pins[pin_idx]))
+
+    if not ingredients:
+        raise ValueError("recipe has no ingredients")
+
+    # Run times come from each pump's calibrated flow curve and the ingredient's viscosity
+    run_times = tuple((ingredient.pin, calibration.run_time(ingredient.motor, ingredient.quantity, ingredient.name))
+                      for ingredient in ingredients)
+    dead_times = {ingredient.pin: calibration.dead_time(ingredient.motor) for ingredient in ingredients}
+    return Recipe(name, data.get('image_url'), data.get('imgpath'), tuple(ingredients), run_times, dead_times)
+
+
+class RecipeStore:
+    # Recipes compiled once at load time. Broken recipes are rejected up front
+    # (and listed in self.errors) instead of failing halfway through a pour.
+    def __init__(self, recipes, relay_pins, motor_mapping=None, flow_rate=1.5, calibration=None):
+        self.relay_pins = relay_pins
+        self.motor_mapping = motor_mapping
+        self.flow_rate = flow_rate
+        self.calibration = calibration if calibration is not None else CalibrationProfile(default_flow_rate=flow_rate)
+        self.path = None
+        self.recipes = {}
+        self.errors = {}
+
+        for name, data in recipes.items():
+            try:
+                self.recipes[name] = compile_recipe(name, data, relay_pins, motor_mapping, self.calibration)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.errors[name] = str(e)
+                print(f"Skipping recipe {name}: {e}")
+
+        # Which recipes draw from each motor, so a reservoir change only
+        # rechecks the recipes that use it
+        self.motor_index = {}
+        for name, recipe in self.recipes.items():
+            for ingredient in recipe.ingredients:
+                self.motor_index.setdefault(ingredient.motor, []).append(name)
+
+    @classmethod
+    def load(cls, path, relay_pins, motor_mapping=None, flow_rate=1.5, calibration=None):
+        with open(path) as file:
+            store = cls(json.load(file), relay_pins, motor_mapping, flow_rate, calibration)
+        store.path = path
+        return store
+
+    def reload(self):
+        # A fresh store built from the same file and rig settings
+        return RecipeStore.load(self.path, self.relay_pins, self.motor_mapping, self.flow_rate, self.calibration)
+
+    def __getitem__(self, name):
+        return self.recipes[name]
+
+    def __contains__(self, name):
+        return name in self.recipes
+
+    def __iter__(self):
+        return iter(self.recipes)
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def get(self, name, default=None):
+        return self.recipes.get(name, default)
+
+    def flow_rates(self):
+        # Calibrated ml/s of every relay pin the menu pours from
+        return {ingredient.pin: self.calibration.curve(ingredient.motor).flow_rate
+                for recipe in self.recipes.values() for ingredient in recipe.ingredients}
+
+    def recipes_using(self, motors):
+        names = set()
+        for motor in motors:
+            names.update(self.motor_index.get(motor, ()))
+        return names
+
+
+def diff_stores(old, new):
+    # Names added, removed and changed between two recipe stores
+    added = [name for name in new if name not in old]
+    removed = [name for name in old if name not in new]
+    changed = [name for name in new if name in old and new[name].signature() != old[name].signature()]
+    return added, removed, changed
@@ -0,0 +1,67 @@
+import os
+import queue
+import threading
+
+from recipe_store import diff_stores
+
+# How often holiday.json is checked for changes (seconds)
+check_interval = 1.0
+
+# How often the Tk side picks up a finished reload (ms)
+poll_interval_ms = 200
+
+
+class RecipeWatcher:
+    # Watches the recipe file from a background thread. When it changes, the
+    # new file is parsed, compiled and diffed off the Tk thread; only the diff
+    # is handed to on_change(store, added, removed, changed) on the Tk thread.
+    def __init__(self, root, store, on_change, check_interval=check_interval):
+        self.root = root
+        self.store = store
+        self.on_change = on_change
+        self.check_interval = check_interval
+        self.results = queue.Queue()
+        self.stop_event = threading.Event()
+        self.last_stat = self._stat()
+
+        self.thread = threading.Thread(target=self._watch, name="recipe-watcher", daemon=True)
+        self.thread.start()
+        self.root.after(poll_interval_ms, self._poll_results)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.store.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch(self):
+        while not self.stop_event.wait(self.check_interval):
+            current = self._stat()
+            if current is None or current == self.last_stat:
+                continue
+            self.last_stat = current
+            try:
+                new_store = self.store.reload()
+            except Exception as e:
+                # Most likely caught mid-save; the next write triggers another try
+                print(f"Error reloading {self.store.path}: {e}")
+                continue
+
+            added, removed, changed = diff_stores(self.store, new_store)
+            self.store = new_store
+            if added or removed or changed:
+                self.results.put((new_store, added, removed, changed))
+
+    def _poll_results(self):
+        while True:
+            try:
+                store, added, removed, changed = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.on_change(store, added, removed, changed)
+        if not self.stop_event.is_set():
+            self.root.after(poll_interval_ms, self._poll_results)
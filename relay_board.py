@@ -0,0 +1,280 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Which backend open_board uses: "rpi" for the real relay module, "sim" for
+# the in-memory simulator
+backend = os.environ.get("CBR_GPIO", "rpi")
+
+# Starting guess for how late the OS wakes a sleeping thread (s)
+initial_wake_latency = 0.001
+
+# Longest a wait may spin at its end, whatever latency was learned (s)
+max_spin = 0.005
+
+# How often the simulated board feeds flow-meter pulses (s)
+flow_tick = 0.002
+
+
+class RealClock:
+    def now(self):
+        return time.monotonic()
+
+    def wait(self, event, seconds):
+        # Returns True if the event was set before the time ran out
+        return event.wait(seconds)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class PrecisionClock(RealClock):
+    # Sleeps through most of a wait and spins on the monotonic clock for the
+    # rest. The spin window is learned from how late this host's sleeps
+    # actually wake up (mean plus three deviations), so a loaded Pi spins a
+    # little longer and an idle one hardly at all. The spin yields the GIL.
+    def __init__(self, wake_latency=initial_wake_latency, max_spin=max_spin):
+        self.mean = wake_latency
+        self.deviation = wake_latency / 2
+        self.max_spin = max_spin
+        self.samples = 0
+
+    def spin_window(self):
+        return min(self.max_spin, self.mean + 3 * self.deviation)
+
+    def _learn(self, overshoot):
+        # Exponentially weighted mean and mean deviation of the wake-up latency
+        error = overshoot - self.mean
+        self.mean += 0.1 * error
+        self.deviation += 0.1 * (abs(error) - self.deviation)
+        self.samples += 1
+
+    def wait(self, event, seconds):
+        start = time.monotonic()
+        deadline = start + seconds
+        coarse = seconds - self.spin_window()
+        if coarse > 0:
+            if event.wait(coarse):
+                return True
+            self._learn(max(0.0, time.monotonic() - (start + coarse)))
+        while time.monotonic() < deadline:
+            if event.is_set():
+                return True
+            time.sleep(0)
+        return event.is_set()
+
+    def sleep(self, seconds):
+        self.wait(threading.Event(), seconds)
+
+
+class VirtualClock:
+    # Time only moves when someone waits, so a 60 s pour is simulated instantly.
+    # Callbacks scheduled with call_at fire in order as time passes them, and a
+    # wait whose event one of them sets ends at that callback's time.
+    def __init__(self, start=0.0):
+        self.current = start
+        self.lock = threading.Lock()
+        self.timers = []  # (time, seq, callback)
+        self.seq = itertools.count()
+
+    def now(self):
+        return self.current
+
+    def call_at(self, when, callback):
+        with self.lock:
+            heapq.heappush(self.timers, (when, next(self.seq), callback))
+
+    def advance(self, seconds, event=None):
+        with self.lock:
+            target = self.current + max(0.0, seconds)
+        while True:
+            with self.lock:
+                if not self.timers or self.timers[0][0] > target:
+                    self.current = max(self.current, target)
+                    return
+                when, _, callback = heapq.heappop(self.timers)
+                self.current = max(self.current, when)
+            callback()
+            if event is not None and event.is_set():
+                return
+
+    def wait(self, event, seconds):
+        if event.is_set():
+            return True
+        self.advance(seconds, event)
+        return event.is_set()
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+
+class RPiRelayBoard:
+    # Relay module and LED strip on the Pi's GPIO header. The relays are
+    # active-low: LOW switches a pump on, HIGH switches it off.
+    def __init__(self, relay_pins, led_pins=()):
+        import RPi.GPIO as GPIO
+
+        self.GPIO = GPIO
+        self.clock = PrecisionClock()
+        self.relay_pins = list(relay_pins)
+        self.led_pins = list(led_pins)
+
+        GPIO.setmode(GPIO.BOARD)
+        GPIO.setwarnings(False)
+        for pin in self.relay_pins:
+            GPIO.setup(pin, GPIO.OUT)
+            GPIO.output(pin, GPIO.HIGH)
+        for pin in self.led_pins:
+            GPIO.setup(pin, GPIO.OUT)
+
+    def relay_on(self, pin):
+        self.GPIO.output(pin, self.GPIO.LOW)
+
+    def relay_off(self, pin):
+        self.GPIO.output(pin, self.GPIO.HIGH)
+
+    def set_led(self, pin, on):
+        self.GPIO.output(pin, self.GPIO.HIGH if on else self.GPIO.LOW)
+
+    def watch_pulses(self, pin, callback):
+        # Flow-meter input: the hall sensor pulls the line low once per pulse,
+        # and RPi.GPIO calls back from its own edge-detection thread
+        self.GPIO.setup(pin, self.GPIO.IN, pull_up_down=self.GPIO.PUD_UP)
+        self.GPIO.add_event_detect(pin, self.GPIO.FALLING, callback=callback)
+
+    def cleanup(self):
+        self.GPIO.cleanup()
+
+
+class SimulatedRelayBoard:
+    # In-memory stand-in for the relay module. Every transition is recorded
+    # with a timestamp from the board's clock, so pour timing and concurrency
+    # can be checked without hardware.
+    def __init__(self, relay_pins, led_pins=(), clock=None):
+        self.clock = clock if clock is not None else PrecisionClock()
+        self.relay_pins = list(relay_pins)
+        self.led_pins = list(led_pins)
+        self.lock = threading.Lock()
+        self.transitions = []  # (time, pin, on)
+        self.relays = {pin: False for pin in self.relay_pins}
+        self.leds = {pin: False for pin in self.led_pins}
+        self.pulse_callbacks = {}  # input pin -> edge callbacks
+        self.flows = {}  # relay pin -> (flow-meter pin, pulses per second while on)
+        self.flow_runs = {}  # relay pin -> count of times it switched on, to drop pulses of earlier runs
+        self.flow_thread = None
+        self.flow_stop = threading.Event()
+
+    def relay_on(self, pin):
+        self._set(pin, True)
+
+    def relay_off(self, pin):
+        self._set(pin, False)
+
+    def set_led(self, pin, on):
+        self.leds[pin] = on
+
+    def watch_pulses(self, pin, callback):
+        self.pulse_callbacks.setdefault(pin, []).append(callback)
+
+    def pulse(self, pin, count=1):
+        # Fires the callbacks of an input pin as `count` falling edges would
+        for _ in range(count):
+            for callback in self.pulse_callbacks.get(pin, ()):
+                callback(pin)
+
+    def simulate_flow(self, relay_pin, meter_pin, pulses_per_second):
+        # Feeds meter_pin pulses for as long as relay_pin is on: on the board's
+        # clock when it keeps timers (VirtualClock), otherwise in real time
+        self.flows[relay_pin] = (meter_pin, pulses_per_second)
+        if hasattr(self.clock, "call_at"):
+            return
+        if self.flow_thread is None:
+            self.flow_thread = threading.Thread(target=self._flow_loop, name="simulated-flow", daemon=True)
+            self.flow_thread.start()
+
+    def _flow_loop(self):
+        owed = {}  # relay pin -> part of a pulse carried into the next tick
+        last = time.monotonic()
+        while not self.flow_stop.wait(flow_tick):
+            now = time.monotonic()
+            elapsed = now - last
+            last = now
+            for relay_pin, (meter_pin, rate) in list(self.flows.items()):
+                if not self.relays.get(relay_pin):
+                    owed.pop(relay_pin, None)
+                    continue
+                owed[relay_pin] = owed.get(relay_pin, 0.0) + elapsed * rate
+                pulses = int(owed[relay_pin])
+                owed[relay_pin] -= pulses
+                self.pulse(meter_pin, pulses)
+
+    def _flow_pulse(self, relay_pin, run):
+        # One pulse of a clock-driven flow, rescheduling the next while the same run lasts
+        meter_pin, rate = self.flows[relay_pin]
+        if not self.relays.get(relay_pin) or self.flow_runs.get(relay_pin) != run:
+            return
+        self.pulse(meter_pin)
+        self.clock.call_at(self.clock.now() + 1 / rate, lambda: self._flow_pulse(relay_pin, run))
+
+    def cleanup(self):
+        self.flow_stop.set()
+        for pin in self.relay_pins:
+            self.relays[pin] = False
+
+    def _set(self, pin, on):
+        with self.lock:
+            if pin not in self.relays:
+                raise ValueError(f"pin {pin} is not a relay pin")
+            if self.relays[pin] != on:
+                self.relays[pin] = on
+                self.transitions.append((self.clock.now(), pin, on))
+                if on and pin in self.flows and hasattr(self.clock, "call_at"):
+                    run = self.flow_runs[pin] = self.flow_runs.get(pin, 0) + 1
+                    self.clock.call_at(self.clock.now() + 1 / self.flows[pin][1],
+                                       lambda: self._flow_pulse(pin, run))
+
+    def active(self):
+        return [pin for pin, on in self.relays.items() if on]
+
+    def intervals(self, pin):
+        # (start, end) of every stretch the relay was on; end is None if still on
+        result = []
+        start = None
+        for at, transition_pin, on in self.transitions:
+            if transition_pin != pin:
+                continue
+            if on:
+                start = at
+            elif start is not None:
+                result.append((start, at))
+                start = None
+        if start is not None:
+            result.append((start, None))
+        return result
+
+    def on_time(self, pin):
+        return sum(end - start for start, end in self.intervals(pin) if end is not None)
+
+    def max_concurrent(self):
+        # Largest number of relays that were on at the same moment
+        active = 0
+        peak = 0
+        for _, _, on in sorted(self.transitions, key=lambda t: (t[0], t[2])):
+            active += 1 if on else -1
+            peak = max(peak, active)
+        return peak
+
+
+def open_board(relay_pins, led_pins=(), backend=backend):
+    # The simulator is only ever used when asked for: a kiosk that quietly
+    # fell back to it would take orders and report drinks ready with no pump running
+    if backend == "sim":
+        return SimulatedRelayBoard(relay_pins, led_pins)
+    if backend != "rpi":
+        raise ValueError(f"unknown relay board backend {backend!r}, expected 'rpi' or 'sim'")
+    try:
+        return RPiRelayBoard(relay_pins, led_pins)
+    except ImportError as e:
+        raise RuntimeError(f"RPi.GPIO unavailable ({e}); set CBR_GPIO=sim to run without the relay module") from e
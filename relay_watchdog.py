@@ -0,0 +1,99 @@
+import itertools
+import threading
+
+from relay_board import RealClock
+
+# Longest a relay may stay on past its commanded deadline before the
+# watchdog switches it off itself (s)
+max_overrun = 0.05
+
+# A relay the pour thread switched off later than this still counts as a near miss (s)
+near_miss_after = 0.02
+
+
+class RelayWatchdog:
+    # Independent thread that knows when every running relay is due to stop.
+    # If the pour thread stalls or dies between switching a pump on and off,
+    # the watchdog drops the relay within max_overrun of its deadline (plus
+    # its own wake-up latency). Needs a real-time clock: under a VirtualClock
+    # the deadlines run ahead of the wall time it sleeps on.
+    #
+    # Every arm gets its own token and trips switch the relay off while
+    # holding the lock, so a trip decided for one pour can never land on the
+    # next pour of the same pump after it was disarmed and armed again.
+    def __init__(self, relay_off, clock=None, max_overrun=max_overrun, near_miss_after=near_miss_after,
+                 telemetry=None):
+        self.relay_off = relay_off
+        self.clock = clock if clock is not None else RealClock()
+        self.max_overrun = max_overrun
+        self.near_miss_after = near_miss_after
+        self.telemetry = telemetry
+        self.lock = threading.Lock()
+        self.deadlines = {}  # motor_pin -> (time it must be off by, arm token)
+        self.tokens = itertools.count(1)
+        self.trips = 0  # relays the watchdog had to switch off
+        self.near_misses = 0  # relays switched off late, but before the watchdog stepped in
+        self.worst_overrun = 0.0
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="relay-watchdog", daemon=True)
+        self.thread.start()
+
+    def arm(self, motor_pin, deadline):
+        # Returns the token to disarm this pour with
+        with self.lock:
+            token = next(self.tokens)
+            self.deadlines[motor_pin] = (deadline, token)
+        self.wake.set()
+        return token
+
+    def disarm(self, motor_pin, token=None):
+        # A token from an earlier arm leaves the current one in place
+        now = self.clock.now()
+        with self.lock:
+            armed = self.deadlines.get(motor_pin)
+            if armed is None or (token is not None and armed[1] != token):
+                return
+            del self.deadlines[motor_pin]
+            deadline = armed[0]
+            overrun = now - deadline
+            self.worst_overrun = max(self.worst_overrun, overrun)
+            if overrun <= self.near_miss_after:
+                return
+            self.near_misses += 1
+        if self.telemetry is not None:
+            self.telemetry.record("relay_near_miss", pin=motor_pin, overrun_ms=round(overrun * 1000, 2))
+
+    def stop(self, timeout=2):
+        self.stop_event.set()
+        self.wake.set()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake.clear()
+            now = self.clock.now()
+            tripped = []
+            with self.lock:
+                overdue = [(pin, deadline) for pin, (deadline, _) in self.deadlines.items()
+                           if now >= deadline + self.max_overrun]
+                for pin, deadline in overdue:
+                    del self.deadlines[pin]
+                    try:
+                        self.relay_off(pin)
+                    except Exception as e:
+                        print(f"Error: watchdog could not switch off relay {pin}: {e}")
+                    self.trips += 1
+                    tripped.append((pin, deadline))
+                next_check = min((deadline for deadline, _ in self.deadlines.values()), default=None)
+
+            for pin, deadline in tripped:
+                print(f"Error: relay {pin} overran its deadline by {(now - deadline) * 1000:.0f} ms, "
+                      f"watchdog switched it off")
+                if self.telemetry is not None:
+                    self.telemetry.record("relay_watchdog_trip", pin=pin, overrun_ms=round((now - deadline) * 1000, 2))
+
+            if next_check is None:
+                self.wake.wait()
+            else:
+                self.wake.wait(max(0.0, next_check + self.max_overrun - self.clock.now()))
@@ -0,0 +1,38 @@
+import random
+
+# Grams per ml of the liquid on the scale; close enough to water for most mixers
+density = 1.0
+
+
+class SerialScale:
+    # Kitchen scale that prints its weight in grams, one reading per line,
+    # over a serial port. pyserial is only needed when a real scale is used.
+    def __init__(self, port, baudrate=9600, timeout=2, density=density):
+        import serial
+
+        self.connection = serial.Serial(port, baudrate, timeout=timeout)
+        self.density = density
+
+    def read_ml(self):
+        self.connection.reset_input_buffer()
+        line = self.connection.readline().decode(errors="ignore").strip()
+        grams = float("".join(ch for ch in line if ch in "0123456789.-"))
+        return grams / self.density
+
+
+class SimulatedScale:
+    # Stands in for the serial scale off-device. It "weighs" each burst from a
+    # made-up pump curve plus a little noise, so the whole workflow can be tried.
+    def __init__(self, flow_rate=1.5, dead_time=0.3, noise_ml=0.2, density=density):
+        self.flow_rate = flow_rate
+        self.dead_time = dead_time
+        self.noise_ml = noise_ml
+        self.density = density
+        self.last_burst = 0.0
+
+    def burst(self, seconds):
+        self.last_burst = seconds
+
+    def read_ml(self):
+        poured = max(0.0, self.last_burst - self.dead_time) * self.flow_rate
+        return max(0.0, poured + random.uniform(-self.noise_ml, self.noise_ml))
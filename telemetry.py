@@ -0,0 +1,109 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# Structured event log, one JSON object per line; rotated to .1, .2, ... when full
+telemetry_path = os.environ.get("CBR_TELEMETRY", "telemetry.jsonl")
+
+# Size at which the log rotates (bytes), and how many rotated files are kept
+max_bytes = 1024 * 1024
+backup_count = 3
+
+# Events buffered for the writer thread; past this, events are dropped
+# rather than ever blocking a pour
+queue_size = 10000
+
+
+class Telemetry:
+    # record() only builds a dict and queues it, so it is cheap enough for the
+    # pour thread. Serialising, disk writes and rotation all happen on the
+    # writer thread. Together the live file and its backups form a ring of
+    # roughly (backup_count + 1) * max_bytes. Listeners (e.g. metrics.Metrics)
+    # see every event on the writer thread as well.
+    def __init__(self, path=telemetry_path, max_bytes=max_bytes, backup_count=backup_count, queue_size=queue_size,
+                 listeners=()):
+        self.path = path
+        self.listeners = list(listeners)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.events = queue.Queue(queue_size)
+        self.dropped = 0
+        self.phases = []  # (name, ms) of every start-up phase, for boot reports
+        self.file = None
+        self.writer = threading.Thread(target=self._write_loop, name="telemetry-writer", daemon=True)
+        self.writer.start()
+
+    def record(self, event, **fields):
+        entry = {'event': event, 't': time.time()}
+        entry.update(fields)
+        try:
+            self.events.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def phase(self, name, since):
+        # Records a start-up phase that began at perf_counter() value `since`;
+        # returns the current perf_counter() so phases can be chained
+        now = time.perf_counter()
+        ms = round((now - since) * 1000, 2)
+        self.phases.append((name, ms))
+        self.record("startup_phase", phase=name, ms=ms)
+        return now
+
+    def close(self, timeout=2):
+        try:
+            self.events.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.writer.join(timeout)
+
+    def _write_loop(self):
+        while True:
+            entry = self.events.get()
+            batch = [entry]
+            # Draining whatever else is waiting so a burst costs one write
+            while entry is not None:
+                try:
+                    entry = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(entry)
+
+            events = [entry for entry in batch if entry is not None]
+            for listener in self.listeners:
+                for entry in events:
+                    try:
+                        listener(entry)
+                    except Exception as e:
+                        print(f"Error in telemetry listener: {e}")
+            lines = "".join(json.dumps(entry, default=str) + "\n" for entry in events)
+            if lines:
+                self._write(lines)
+            if batch[-1] is None:
+                break
+        if self.file is not None:
+            self.file.close()
+
+    def _write(self, lines):
+        try:
+            if self.file is None:
+                self.file = open(self.path, "a")
+            self.file.write(lines)
+            self.file.flush()
+            if self.file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print(f"Error writing telemetry {self.path}: {e}")
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to the kiosk scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from relay_board import SimulatedRelayBoard, VirtualClock
+
+relay_pins = [40, 38, 36, 32, 37, 35]
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
+
+
+@pytest.fixture
+def board(clock):
+    return SimulatedRelayBoard(relay_pins, clock=clock)
@@ -0,0 +1,52 @@
+import pytest
+
+from flow_meter import open_flow_meters, pulses_per_ml
+from pipeline_executor import make_executor
+from pour_engine import PourJob
+
+meter_pin = 29
+
+# Pour mode and glass stations: the single executor and the pipelined one
+executors = [("sequential", 1), ("atonce", 1), ("sequential", 2)]
+
+
+def metered_pour(board, clock, flow_rate, run_time, ml, mode="sequential", stations=1):
+    meters = open_flow_meters(board, {40: meter_pin}, flow_rates={40: flow_rate})
+    executor = make_executor(None, board.relay_on, board.relay_off, stations=stations, clock=clock,
+                             flow_meters=meters)
+    try:
+        job = executor.submit(PourJob("Test", 1, [(40, run_time)], mode=mode, volumes={40: ml}))
+        assert job.finished.wait(5)
+    finally:
+        executor.shutdown()
+    return job, meters[40]
+
+
+@pytest.mark.parametrize("mode, stations", executors)
+def test_metered_pump_stops_on_volume(board, clock, mode, stations):
+    # The pump is faster than its calibration says: the meter stops it early
+    job, meter = metered_pour(board, clock, flow_rate=10.0, run_time=10.0, ml=30, mode=mode, stations=stations)
+    assert job.state == "done"
+    assert job.flow_shortfalls == {}
+    [(start, end)] = board.intervals(40)
+    assert end - start == pytest.approx(3.0, abs=1 / (10.0 * pulses_per_ml))
+    assert meter.ml() >= 30
+
+
+@pytest.mark.parametrize("mode, stations", executors)
+def test_metered_pump_times_out_short(board, clock, mode, stations):
+    # A slow (emptying) pump is cut off at timeout_factor times its run time,
+    # and the drink is reported short instead of ready
+    job, meter = metered_pour(board, clock, flow_rate=1.0, run_time=3.0, ml=30, mode=mode, stations=stations)
+    assert job.state == "short"
+    assert board.intervals(40) == [(0.0, 6.0)]
+    target, measured = job.flow_shortfalls[40]
+    assert target == pytest.approx(30, abs=1 / pulses_per_ml)
+    assert measured == pytest.approx(6.0, abs=0.5)
+
+
+def test_simulated_flow_uses_calibrated_rate(board, clock):
+    # A pump calibrated at 105 ml/s must not come up short on the simulator
+    job, _ = metered_pour(board, clock, flow_rate=105.0, run_time=45 / 105.0, ml=45)
+    assert job.state == "done"
+    assert job.flow_shortfalls == {}
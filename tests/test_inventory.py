@@ -0,0 +1,65 @@
+import pytest
+
+from inventory import Inventory, OutOfStock
+from recipe_store import RecipeStore
+
+relay_pins = [40, 38, 36, 32, 37, 35]
+
+
+@pytest.fixture
+def amf():
+    # 30 ml from motor 1 and 20 ml from motor 2 per drink
+    store = RecipeStore({'AMF': {'image_url': None, 'imgpath': None,
+                                 'ingredients': [{'name': "Vodka", 'quantity': 30, 'motor': 1},
+                                                 {'name': "Gin", 'quantity': 20, 'motor': 2}]}}, relay_pins)
+    return store['AMF']
+
+
+def test_reserve_holds_stock_for_later_orders(tmp_path, amf):
+    inventory = Inventory(str(tmp_path / "inventory.jsonl"))
+    inventory.fill(1, 100)
+    inventory.reserve(1, amf, 2)
+    assert inventory.level(1) == 100
+    assert inventory.available(1) == 40
+    # Motor 2 was never filled, so it is bottomless
+    assert inventory.available(2) is None
+    with pytest.raises(OutOfStock) as refused:
+        inventory.reserve(2, amf, 2)
+    assert refused.value.short == ["Vodka"]
+    inventory.reserve(3, amf, 1)
+    assert inventory.available(1) == 10
+
+
+def test_commit_debits_and_release_returns_stock(tmp_path, amf):
+    path = str(tmp_path / "inventory.jsonl")
+    inventory = Inventory(path)
+    inventory.fill(1, 100)
+    inventory.reserve(1, amf, 2)
+    inventory.reserve(2, amf, 1)
+    inventory.commit(1)
+    inventory.release(2)
+    assert (inventory.level(1), inventory.available(1)) == (40, 40)
+    # A second commit or release of the same order changes nothing
+    inventory.commit(1)
+    inventory.release(2)
+    assert (inventory.level(1), inventory.available(1)) == (40, 40)
+    assert Inventory(path).level(1) == 40
+
+
+def test_holds_survive_compaction_and_stale_ones_are_reconciled(tmp_path, amf):
+    path = str(tmp_path / "inventory.jsonl")
+    inventory = Inventory(path)
+    inventory.fill(1, 100)
+    inventory.reserve(1, amf, 1)
+    inventory.reserve(2, amf, 1)
+
+    restored = Inventory(path)
+    assert restored.reservations.keys() == {1, 2}
+    assert restored.available(1) == 40
+    with open(path) as file:
+        assert len(file.readlines()) == 3  # one fill and one line per hold
+
+    # Order 2 was taken just before a crash and never poured
+    restored.reconcile([1])
+    assert restored.available(1) == 70
+    assert Inventory(path).reservations.keys() == {1}
@@ -0,0 +1,70 @@
+import http.client
+import json
+
+import pytest
+
+from inventory import Inventory
+from order_api import OrderAPI
+from order_queue import OrderQueue
+from recipe_store import RecipeStore
+
+relay_pins = [40, 38, 36, 32, 37, 35]
+
+
+class IdleScheduler:
+    # Never takes orders, so they stay queued and cancellable
+    in_flight = []
+
+    def outcome(self, order_id):
+        return None
+
+
+@pytest.fixture
+def api(tmp_path):
+    recipes = RecipeStore({'AMF': {'image_url': None, 'imgpath': None,
+                                   'ingredients': [{'name': "Vodka", 'quantity': 30, 'motor': 1}]}}, relay_pins)
+    api = OrderAPI(lambda: recipes, Inventory(str(tmp_path / "inventory.jsonl")),
+                   OrderQueue(str(tmp_path / "orders.jsonl")), IdleScheduler(), lambda name, count, pitcher: 10.0)
+    assert api.start("127.0.0.1", 0)
+    yield api
+    api.stop()
+
+
+def call(api, method, path, body=None, token=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", api.port, timeout=5)
+    headers = dict(headers or {})
+    if token is not None:
+        headers['X-Order-Token'] = token
+    connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def test_order_calls_need_the_token_from_placing_it(api):
+    status, placed = call(api, "POST", "/orders", {'cocktail': "AMF", 'count': 2})
+    assert status == 201
+    order_id, token = placed['order_id'], placed['token']
+
+    # Counting up order ids gets a stranger nowhere
+    assert call(api, "GET", f"/orders/{order_id}")[0] == 404
+    assert call(api, "DELETE", f"/orders/{order_id}")[0] == 404
+    assert call(api, "DELETE", f"/orders/{order_id}", token="guess")[0] == 404
+    upgrade = {'Upgrade': "websocket", 'Connection': "Upgrade", 'Sec-WebSocket-Key': "dGhlIHNhbXBsZSBub25jZQ=="}
+    assert call(api, "GET", f"/orders/{order_id}/stream?token=guess", headers=upgrade)[0] == 404
+
+    assert call(api, "GET", f"/orders/{order_id}", token=token) == (200, {'order_id': order_id, 'state': "queued",
+                                                                          'position': 1, 'eta': 10})
+    assert call(api, "GET", f"/orders/{order_id}?token={token}")[0] == 200
+    assert call(api, "DELETE", f"/orders/{order_id}", token=token) == (200, {'order_id': order_id,
+                                                                             'state': "cancelled"})
+    assert len(api.order_queue) == 0
+
+
+def test_tokens_are_per_order(api):
+    first = call(api, "POST", "/orders", {'cocktail': "AMF"})[1]
+    second = call(api, "POST", "/orders", {'cocktail': "AMF"})[1]
+    assert first['token'] != second['token']
+    assert call(api, "DELETE", f"/orders/{second['order_id']}", token=first['token'])[0] == 404
+    assert len(api.order_queue) == 2
@@ -0,0 +1,38 @@
+from order_queue import OrderQueue
+
+
+def test_journal_replays_orders_still_waiting(tmp_path):
+    path = str(tmp_path / "orders.jsonl")
+    orders = OrderQueue(path)
+    first = orders.put("AMF", 1)
+    orders.put("Peach Crush", 2, pitcher=True)
+    third = orders.put("AMF", 3)
+    orders.put("Blue Lagoon", 1)
+    assert [order.order_id for order in orders.take()] == [first.order_id]
+    orders.cancel(third.order_id)
+
+    restored = OrderQueue(path)
+    assert [(order.cocktail_name, order.num_cocktails, order.pitcher) for order in restored.snapshot()] == \
+        [("Peach Crush", 2, True), ("Blue Lagoon", 1, False)]
+    # Ids keep counting from where the journal left off
+    assert restored.put("AMF", 1).order_id == 5
+
+
+def test_replay_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    orders = OrderQueue(str(path))
+    orders.put("AMF", 1)
+    with open(path, "a") as file:
+        file.write('{"op": "add", "id": 2, "cock')
+    assert [order.cocktail_name for order in OrderQueue(str(path)).snapshot()] == ["AMF"]
+
+
+def test_pitcher_orders_never_merge(tmp_path):
+    orders = OrderQueue(str(tmp_path / "orders.jsonl"))
+    orders.put("AMF", 1)
+    orders.put("AMF", 2)
+    orders.put("AMF", 4, pitcher=True)
+    orders.put("AMF", 1)
+    assert [order.num_cocktails for order in orders.take()] == [1, 2]
+    assert [order.num_cocktails for order in orders.take()] == [4]
+    assert [order.num_cocktails for order in orders.take()] == [1]
@@ -0,0 +1,60 @@
+import threading
+
+from batch_planner import plan_batch
+from pipeline_executor import PipelinedPourExecutor
+from pour_engine import PourJob
+
+
+def overlaps(first, second):
+    return first[0] < second[1] and second[0] < first[1]
+
+
+def test_stations_share_idle_pumps_but_never_a_busy_one(board, clock):
+    # The first relay switch waits for both jobs, so both are on stations
+    gate = threading.Event()
+
+    def relay_on(pin):
+        gate.wait(5)
+        board.relay_on(pin)
+
+    executor = PipelinedPourExecutor(None, relay_on, board.relay_off, stations=2, clock=clock)
+    try:
+        first = executor.submit(PourJob("First", 1, [(40, 2.0), (38, 1.0)], mode="atonce"))
+        second = executor.submit(PourJob("Second", 1, [(40, 1.0), (36, 1.0)], mode="atonce"))
+        gate.set()
+        assert first.finished.wait(5) and second.finished.wait(5)
+    finally:
+        executor.shutdown()
+
+    assert first.state == second.state == "done"
+    assert first.station != second.station
+    # Pump 40 pours for one glass at a time, oldest order first
+    assert board.intervals(40) == [(0.0, 2.0), (2.0, 3.0)]
+    # Pump 36 is idle, so the second glass starts on it straight away
+    assert board.intervals(36) == [(0.0, 1.0)]
+    assert overlaps(board.intervals(36)[0], board.intervals(40)[0])
+
+
+def test_failed_station_leaves_the_other_pouring(board, clock):
+    executor = PipelinedPourExecutor(None, board.relay_on, board.relay_off, stations=2, clock=clock)
+    try:
+        broken = executor.submit(PourJob("Broken", 1, [(99, 1.0)]))
+        good = executor.submit(PourJob("Good", 1, [(38, 1.0)]))
+        assert broken.finished.wait(5) and good.finished.wait(5)
+    finally:
+        executor.shutdown()
+    assert broken.state == "failed"
+    assert good.state == "done"
+    assert board.active() == []
+
+
+def test_swap_pause_between_glasses(board, clock):
+    plan = plan_batch([(40, 1.0)], 2, 30, swap_pause=4)
+    executor = PipelinedPourExecutor(None, board.relay_on, board.relay_off, stations=2, clock=clock)
+    try:
+        job = executor.submit(PourJob("Two", 2, [(40, 1.0)], plan=plan))
+        assert job.finished.wait(5)
+    finally:
+        executor.shutdown()
+    assert job.state == "done"
+    assert board.intervals(40) == [(0.0, 1.0), (5.0, 6.0)]
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from batch_planner import plan_batch
+from pour_engine import PourExecutor, PourJob, jitter_report
+from power_budget import PowerBudget
+from relay_board import RealClock
+
+
+def pour(board, clock, job, **kwargs):
+    executor = PourExecutor(None, board.relay_on, board.relay_off, clock=clock, **kwargs)
+    try:
+        executor.submit(job)
+        assert job.finished.wait(5)
+    finally:
+        executor.shutdown()
+    return job
+
+
+def test_sequential_pours_one_pump_after_another(board, clock):
+    job = pour(board, clock, PourJob("Test", 1, [(40, 2.0), (38, 1.0), (36, 0.5)]))
+    assert job.state == "done"
+    assert board.intervals(40) == [(0.0, 2.0)]
+    assert board.intervals(38) == [(2.0, 3.0)]
+    assert board.intervals(36) == [(3.0, 3.5)]
+    assert board.max_concurrent() == 1
+
+
+def test_at_once_drops_each_relay_at_its_own_deadline(board, clock):
+    job = pour(board, clock, PourJob("Test", 1, [(40, 3.0), (38, 1.0), (36, 2.0)], mode="atonce"))
+    assert job.state == "done"
+    assert board.intervals(40) == [(0.0, 3.0)]
+    assert board.intervals(38) == [(0.0, 1.0)]
+    assert board.intervals(36) == [(0.0, 2.0)]
+    assert job.stop_jitter == {40: 0.0, 38: 0.0, 36: 0.0}
+    assert "worst" in jitter_report(job)
+
+
+def test_at_once_merges_a_pin_listed_twice(board, clock):
+    pour(board, clock, PourJob("Test", 1, [(40, 1.0), (38, 1.0), (40, 2.0)], mode="atonce"))
+    assert board.intervals(40) == [(0.0, 3.0)]
+
+
+def test_power_budget_staggers_inrush_and_caps_pumps(board, clock):
+    budget = PowerBudget()
+    run_times = [(pin, 5.0) for pin in board.relay_pins]
+    job = pour(board, clock, PourJob("Test", 1, run_times, mode="atonce"), power_budget=budget)
+    assert job.state == "done"
+    starts = sorted(board.intervals(pin)[0][0] for pin in board.relay_pins)
+    # Two inrush peaks fit the supply, the next pumps wait for them to settle
+    assert starts[:4] == pytest.approx([0.0, 0.0, 0.2, 0.4])
+    # The last two wait for a running pump to stop, and again for each other's inrush
+    assert starts[4:] == pytest.approx([5.0, 5.2])
+    assert board.max_concurrent() <= budget.concurrency_limit()
+    assert budget.peak_amps <= budget.supply_amps
+
+
+def test_failed_job_switches_everything_off_and_next_job_runs(board, clock):
+    executor = PourExecutor(None, board.relay_on, board.relay_off, clock=clock)
+    try:
+        broken = executor.submit(PourJob("Broken", 1, [(40, 1.0), (99, 1.0)], mode="atonce"))
+        assert broken.finished.wait(5)
+        good = executor.submit(PourJob("Good", 1, [(38, 1.0)]))
+        assert good.finished.wait(5)
+    finally:
+        executor.shutdown()
+    assert broken.state == "failed"
+    assert good.state == "done"
+    assert board.active() == []
+
+
+def test_shutdown_aborts_and_switches_off(board):
+    started = threading.Event()
+    executor = PourExecutor(None, board.relay_on, board.relay_off, clock=RealClock(),
+                            on_start=lambda job: started.set())
+    job = executor.submit(PourJob("Long", 1, [(40, 30.0)]))
+    assert started.wait(5)
+    executor.shutdown()
+    assert job.finished.wait(5)
+    assert job.state == "aborted"
+    assert board.active() == []
+
+
+def test_pitcher_waits_for_the_pitcher_then_pours_every_drink_at_once(board, clock):
+    plan = plan_batch([(40, 1.0), (38, 2.0)], 3, 30, pitcher=True, swap_pause=4)
+    job = pour(board, clock, PourJob("Pitcher", 3, [(40, 1.0), (38, 2.0)], plan=plan))
+    assert job.state == "done"
+    assert [fill.drinks for fill in plan.fills] == [3]
+    assert board.intervals(40) == [(4.0, 7.0)]
+    assert board.intervals(38) == [(7.0, 13.0)]
@@ -0,0 +1,40 @@
+from recipe_index import RecipeIndex
+from recipe_store import RecipeStore
+
+relay_pins = [40, 38, 36, 32, 37, 35]
+
+
+def recipe(*ingredients):
+    return {'image_url': None, 'imgpath': None,
+            'ingredients': [{'name': name, 'quantity': 30, 'motor': motor} for name, motor in ingredients]}
+
+
+def make_index():
+    return RecipeIndex(RecipeStore({
+        "Martini": recipe(("Gin", 1), ("Vermouth", 2)),
+        "Sloe Fizz": recipe(("Sloe Gin", 3), ("Lemon", 4)),
+        "Mule": recipe(("Vodka", 5), ("Ginger Beer", 0)),
+        "Margarita": recipe(("Tequila", 2), ("Lemon", 4)),
+    }, relay_pins))
+
+
+def test_typing_more_letters_only_narrows_the_result():
+    index = make_index()
+    typed = [index.search(query) for query in ("g", "gi", "gin", "ginger")]
+    assert typed[1] == ["Martini", "Sloe Fizz", "Mule"]
+    assert typed[2] == ["Martini", "Sloe Fizz", "Mule"]
+    assert typed[3] == ["Mule"]
+    for shorter, longer in zip(typed, typed[1:]):
+        assert set(longer) <= set(shorter)
+
+
+def test_no_clause_hides_every_ingredient_it_names():
+    index = make_index()
+    assert index.search("no gin") == ["Margarita"]
+    assert index.search("lemon, no tequila") == ["Sloe Fizz"]
+
+
+def test_unticked_ingredients_hide_exact_matches_only():
+    index = make_index()
+    assert index.search("", {"gin"}) == ["Sloe Fizz", "Mule", "Margarita"]
+    assert index.search("motor 4", {"tequila"}) == ["Sloe Fizz"]
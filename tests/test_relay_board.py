@@ -0,0 +1,30 @@
+import importlib.util
+import threading
+
+import pytest
+
+from relay_board import SimulatedRelayBoard, VirtualClock, open_board
+
+
+def test_open_board_simulator_only_when_asked():
+    assert isinstance(open_board([40], backend="sim"), SimulatedRelayBoard)
+    with pytest.raises(ValueError):
+        open_board([40], backend="simulated")
+
+
+@pytest.mark.skipif(importlib.util.find_spec("RPi") is not None, reason="RPi.GPIO is installed")
+def test_open_board_never_falls_back_to_the_simulator():
+    with pytest.raises(RuntimeError, match="CBR_GPIO=sim"):
+        open_board([40], backend="rpi")
+
+
+def test_virtual_clock_wait_ends_at_the_timer_that_sets_the_event():
+    clock = VirtualClock()
+    event = threading.Event()
+    fired = []
+    clock.call_at(1.0, lambda: fired.append(clock.now()))
+    clock.call_at(2.5, event.set)
+    clock.call_at(4.0, lambda: fired.append(clock.now()))
+    assert clock.wait(event, 10.0)
+    assert clock.now() == 2.5
+    assert fired == [1.0]
@@ -0,0 +1,35 @@
+from relay_board import RealClock, SimulatedRelayBoard
+from relay_watchdog import RelayWatchdog
+
+
+def test_watchdog_ignores_a_stale_disarm():
+    offs = []
+    clock = RealClock()
+    watchdog = RelayWatchdog(offs.append, clock)
+    try:
+        first = watchdog.arm(40, clock.now() + 60)
+        watchdog.disarm(40, first)
+        second = watchdog.arm(40, clock.now() + 60)
+        # A late disarm of the earlier pour leaves the new one armed
+        watchdog.disarm(40, first)
+        assert watchdog.deadlines[40][1] == second
+        watchdog.disarm(40, second)
+        assert 40 not in watchdog.deadlines
+    finally:
+        watchdog.stop()
+    assert offs == []
+
+
+def test_watchdog_drops_an_overrunning_relay():
+    board = SimulatedRelayBoard([40], clock=RealClock())
+    watchdog = RelayWatchdog(board.relay_off, board.clock, max_overrun=0.01)
+    try:
+        board.relay_on(40)
+        watchdog.arm(40, board.clock.now() + 0.02)
+        deadline = board.clock.now() + 2
+        while board.active() and board.clock.now() < deadline:
+            board.clock.sleep(0.01)
+    finally:
+        watchdog.stop()
+    assert board.active() == []
+    assert watchdog.trips == 1
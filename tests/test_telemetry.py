@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from pipeline_executor import make_executor
+from pour_engine import PourJob
+from telemetry import Telemetry
+
+
+@pytest.mark.parametrize("mode, stations", [("sequential", 1), ("atonce", 1), ("sequential", 2)])
+def test_one_relay_event_per_real_transition(tmp_path, board, clock, mode, stations):
+    path = tmp_path / "telemetry.jsonl"
+    telemetry = Telemetry(str(path))
+    executor = make_executor(None, board.relay_on, board.relay_off, stations=stations, clock=clock,
+                             telemetry=telemetry)
+    try:
+        job = executor.submit(PourJob("Test", 1, [(40, 1.0), (38, 2.0)], mode=mode))
+        assert job.finished.wait(5)
+    finally:
+        executor.shutdown()
+        telemetry.close()
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    relay_events = [(entry['pin'], entry['on']) for entry in entries if entry['event'] == "relay"]
+    assert sorted(relay_events) == sorted((pin, on) for _, pin, on in board.transitions)
+    assert [entry['state'] for entry in entries if entry['event'] == "pour_finished"] == ["done"]
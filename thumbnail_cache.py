@@ -0,0 +1,59 @@
+import hashlib
+import os
+import threading
+
+# Where ready-to-display thumbnails are kept between runs
+cache_dir = os.environ.get("CBR_THUMBNAIL_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "cbr", "thumbnails"))
+
+
+class ThumbnailCache:
+    # Persistent cache of pre-resized PNG thumbnails. Entries are keyed by the
+    # source (local path or URL), the target size and, for local files, the
+    # file's mtime, so an edited image is picked up on the next start.
+    def __init__(self, directory=cache_dir):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            print(f"Thumbnail cache disabled, cannot create {self.directory}: {e}")
+            self.directory = None
+
+    def path_for(self, source, size):
+        # URLs have no mtime; a changed picture should be given a new URL
+        mtime = os.path.getmtime(source) if os.path.exists(source) else 0
+        key = f"{source}|{size[0]}x{size[1]}|{mtime}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+    def get(self, source, size):
+        # Returns the PNG bytes of a cached thumbnail, or None
+        if self.directory is None or not source:
+            return None
+        try:
+            with open(self.path_for(source, size), "rb") as file:
+                data = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, source, size, image):
+        if self.directory is None or not source:
+            return
+        path = self.path_for(source, size)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            # Writing to a temporary name first so a crash never leaves half a PNG
+            image.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing thumbnail for {source}: {e}")
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
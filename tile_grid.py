@@ -0,0 +1,100 @@
+# Rows built above and below the visible region so scrolling never shows gaps
+prefetch_rows = 1
+
+
+class LazyTileGrid:
+    # Lays tiles out on a canvas in a fixed grid but only keeps widgets for the
+    # rows inside the visible region (plus a prefetch margin). Tiles scrolled
+    # out of view are destroyed so their PhotoImages can be released.
+    def __init__(self, canvas, columns, tile_width, tile_height, make_tile, release_tile,
+                 v_scrollbar=None, h_scrollbar=None, prefetch_rows=prefetch_rows):
+        self.canvas = canvas
+        self.columns = columns
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.make_tile = make_tile
+        self.release_tile = release_tile
+        self.v_scrollbar = v_scrollbar
+        self.h_scrollbar = h_scrollbar
+        self.prefetch_rows = prefetch_rows
+
+        self.count = 0
+        self.tiles = {}  # index -> (canvas item, widget)
+        self.refresh_pending = False
+
+        # The canvas reports every view change here, whichever way it scrolled
+        self.canvas.configure(yscrollcommand=self._on_yscroll, xscrollcommand=self._on_xscroll)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_refresh())
+
+    def set_count(self, count):
+        # Rebuilding from scratch, e.g. after the recipe list changed
+        for idx in list(self.tiles):
+            self._release(idx)
+        self.count = count
+        rows = (count + self.columns - 1) // self.columns
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.tile_width, rows * self.tile_height))
+        self.schedule_refresh()
+
+    def patch(self, count, stale):
+        # Rebuilding only the given tile indices; all other tiles keep their
+        # widgets and images
+        for idx in list(self.tiles):
+            if idx in stale or idx >= count:
+                self._release(idx)
+        self.count = count
+        rows = (count + self.columns - 1) // self.columns
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.tile_width, rows * self.tile_height))
+        self.schedule_refresh()
+
+    def widget(self, idx):
+        tile = self.tiles.get(idx)
+        return tile[1] if tile is not None else None
+
+    def position(self, idx):
+        return (idx % self.columns) * self.tile_width, (idx // self.columns) * self.tile_height
+
+    def visible_range(self):
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), self.tile_height)
+        first_row = max(0, int(top // self.tile_height) - self.prefetch_rows)
+        last_row = int(bottom // self.tile_height) + self.prefetch_rows
+        return first_row * self.columns, min(self.count, (last_row + 1) * self.columns)
+
+    def schedule_refresh(self):
+        # Coalescing bursts of scroll events into one refresh per idle cycle
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.canvas.after_idle(self.refresh)
+
+    def refresh(self):
+        self.refresh_pending = False
+        first, last = self.visible_range()
+
+        for idx in list(self.tiles):
+            if not first <= idx < last:
+                self._release(idx)
+
+        for idx in range(first, last):
+            if idx not in self.tiles:
+                widget = self.make_tile(idx)
+                x, y = self.position(idx)
+                item = self.canvas.create_window(x, y, window=widget, anchor="nw",
+                                                 width=self.tile_width, height=self.tile_height)
+                self.tiles[idx] = (item, widget)
+
+    def _release(self, idx):
+        item, widget = self.tiles.pop(idx)
+        self.canvas.delete(item)
+        widget.destroy()
+        self.release_tile(idx)
+
+    def _on_yscroll(self, first, last):
+        if self.v_scrollbar is not None:
+            self.v_scrollbar.set(first, last)
+        self.schedule_refresh()
+
+    def _on_xscroll(self, first, last):
+        if self.h_scrollbar is not None:
+            self.h_scrollbar.set(first, last)
+        self.schedule_refresh()
+
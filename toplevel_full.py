@@ -1,33 +1,104 @@
-import tkinter as tk
-from PIL import ImageTk, Image
-import json
-import requests
-import RPi.GPIO as GPIO
+import collections
 import time
-from io import BytesIO
+import tkinter as tk
 from tkinter import ttk
-import os
+from batch_planner import plan_batch
+from calibration import CalibrationProfile
+from details_panel import DetailsPanel
+from flow_meter import open_flow_meters
+from image_loader import ImageLoader
+from ingredient_filter import IngredientFilter
+from inventory import Inventory, OutOfStock
+from metrics import Metrics, serve_metrics
+from order_api import serve_order_api
+from order_queue import OrderQueue, OrderScheduler
+from pipeline_executor import make_executor
+from pour_engine import PourJob
+from power_budget import PowerBudget
+from recipe_index import RecipeIndex
+from recipe_store import RecipeStore
+from recipe_watcher import RecipeWatcher
+from relay_board import open_board
+from relay_watchdog import RelayWatchdog
+from telemetry import Telemetry
+from tile_grid import LazyTileGrid
 
 # Defining the GPIO pins connected to the relay module
 relay_pins = [40, 38, 36, 32, 37, 35, 33, 31, 23, 21, 19, 15, 13, 11, 7]
 
-# Loading recipes from JSON
-with open('holiday.json') as file:
-    recipes = json.load(file)
+# Pump flow rate used when a pump has no calibrated flow curve
+flow_rate = 105
+
+# Glass positions under the spouts; with more than one, orders pour side by side
+glass_stations = 1
+
+# Supply limits for pumps running together: max count and staggered inrush
+power_budget = PowerBudget()
+
+# Flow-meter input pin for each relay pin; pumps listed here stop on the
+# measured volume instead of their calibrated run time. Empty keeps every
+# pump time-based.
+flow_meter_pins = {}
+
+# Per-pump flow curves, priming times and ingredient viscosities for this rig
+calibration = CalibrationProfile.load(default_flow_rate=flow_rate)
+
+# Loading and compiling recipes from JSON
+recipes = RecipeStore.load('holiday.json', relay_pins, flow_rate=flow_rate, calibration=calibration)
 
 class CocktailBartenderRobotGUI:
     def __init__(self, root, recipes):
+        started = time.perf_counter()
         self.root = root
         self.recipes = recipes
-        self.cocktail_images = []
         self.cocktail_names = []
+        # Only tiles currently built on the canvas have an entry here
+        self.cocktail_images = {}
+        self.cocktail_buttons = {}
+        self.cocktail_labels = {}
+
+        # Structured events (relays, orders, image loads, start-up) logged off the Tk thread;
+        # the live metrics are computed from the same stream
+        self.metrics = Metrics()
+        self.telemetry = Telemetry(listeners=[self.metrics.observe])
+
+        # Relay module (and LED strip) behind the board interface; CBR_GPIO=sim runs off-device
+        self.board = open_board(relay_pins)
+        phase = self.telemetry.phase("board", started)
+
+        # Independent guard that drops any relay left on past its deadline
+        self.relay_watchdog = RelayWatchdog(self.board.relay_off, self.board.clock, telemetry=self.telemetry)
+
+        # Pulse counters on the pumps that have a flow meter fitted
+        self.flow_meters = open_flow_meters(self.board, flow_meter_pins, flow_rates=self.recipes.flow_rates())
+
+        # Pours run on a background thread; progress comes back through root.after
+        self.pour_executor = make_executor(self.root, self.turn_on_relay, self.turn_off_relay,
+                                           stations=glass_stations, on_start=self.pour_started,
+                                           on_progress=self.pour_progress, on_done=self.pour_finished,
+                                           clock=self.board.clock, power_budget=power_budget,
+                                           telemetry=self.telemetry, watchdog=self.relay_watchdog,
+                                           flow_meters=self.flow_meters)
+        phase = self.telemetry.phase("pour_executor", phase)
 
-        # Initializing GPIO setup here
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setwarnings(False)
-        for pin in relay_pins:
-            GPIO.setup(pin, GPIO.OUT)
-            GPIO.output(pin, GPIO.HIGH)
+        self.status_label = tk.Label(self.root, text="Ready", bg="#F8C471")
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
+        self.queue_label = tk.Label(self.root, text="Queue: 0 waiting", bg="#F8C471")
+        self.queue_label.pack(side=tk.BOTTOM, fill=tk.X)
+
+        # Images are fetched in the background; tiles start with a placeholder
+        self.image_loader = ImageLoader(self.root, (210, 210), telemetry=self.telemetry)
+
+        # Search bar ("gin", "gin, no lime") and one tick box per ingredient;
+        # unticking "Tequila" hides every drink made with it
+        self.recipe_index = RecipeIndex(self.recipes)
+        self.search_text = tk.StringVar()
+        self.search_entry = tk.Entry(self.root, textvariable=self.search_text)
+        self.search_entry.pack(side=tk.TOP, fill=tk.X)
+        self.search_text.trace_add("write", lambda *args: self.filter_cocktails())
+        self.ingredient_filter = IngredientFilter(self.root, self.filter_cocktails)
+        self.ingredient_filter.frame.pack(side=tk.TOP, fill=tk.X)
+        self.ingredient_filter.set_ingredients(self.recipe_index.ingredient_names)
 
         self.jongo = tk.Frame(self.root, bg="#F8C471")
         self.jongo.pack(fill=tk.BOTH, expand=1)
@@ -41,122 +112,264 @@ class CocktailBartenderRobotGUI:
         self.h_scrollbar = ttk.Scrollbar(self.jongo, orient=tk.HORIZONTAL, command=self.canva.xview)
         self.h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
 
-        self.canva.configure(yscrollcommand=self.v_scrollbar.set, xscrollcommand=self.h_scrollbar.set)
-        self.canva.bind("<Configure>", lambda e: self.canva.configure(scrollregion=self.canva.bbox("all")))
+        self.canva.configure(bg="#F8C471", highlightthickness=0)
+
+        # Only the tiles in view (plus a small margin) are built and hold images
+        self.tile_grid = LazyTileGrid(self.canva, 2, 250, 270, self.make_cocktail_tile, self.release_cocktail_tile,
+                                      v_scrollbar=self.v_scrollbar, h_scrollbar=self.h_scrollbar)
 
-        self.jongo2 = tk.Frame(self.canva, bg="#F8C471")
-        self.canva.create_window((0, 0), window=self.jongo2, anchor="nw")
+        phase = self.telemetry.phase("widgets", phase)
+
+        # A single details window, re-populated on every tap
+        self.details_panel = DetailsPanel(self.root, "500x500", self.order_cocktails)
+
+        # Reservoir levels; recipes a reservoir can't cover are greyed out
+        self.inventory = Inventory()
+        self.unavailable = self.inventory.unavailable(self.recipes)
+        self.inventory.take_changes()
 
         self.load_cocktail_data()
         self.create_cocktail_buttons()
+        phase = self.telemetry.phase("menu", phase)
+
+        # Picking up edits to holiday.json without a restart
+        self.recipe_watcher = RecipeWatcher(self.root, self.recipes, self.apply_recipe_changes)
+
+        # Orders wait in a persistent queue; the scheduler thread feeds them to the pour executor
+        self.order_queue = OrderQueue()
+        self.last_order = None
+        self.failed_orders = collections.deque()  # (orders, error) waiting to be shown on the Tk thread
+        # Stock held for orders that didn't survive the restart goes back to the reservoirs
+        self.inventory.reconcile(order.order_id for order in self.order_queue.snapshot())
+        self.order_scheduler = OrderScheduler(self.order_queue, self.make_cocktails, max_in_flight=glass_stations,
+                                              telemetry=self.telemetry, on_failed=self.order_failed)
+        self.update_queue_label()
+        self.poll_inventory()
+        phase = self.telemetry.phase("orders", phase)
+
+        # Optional Prometheus-style endpoint, enabled by CBR_METRICS_PORT
+        self.metrics.gauge("cbr_queue_depth", "Orders waiting to pour", lambda: len(self.order_queue))
+        self.metrics.gauge("cbr_image_cache_hit_ratio", "Thumbnail cache hits per lookup",
+                           self.image_loader.cache.hit_rate)
+        self.metrics.gauge("cbr_relay_watchdog_trips", "Relays the watchdog had to switch off",
+                           lambda: self.relay_watchdog.trips)
+        self.metrics.gauge("cbr_relay_near_misses", "Relays switched off late but before the watchdog",
+                           lambda: self.relay_watchdog.near_misses)
+        self.metrics.watch_event_loop(self.root)
+        self.metrics_server = serve_metrics(self.metrics)
+        phase = self.telemetry.phase("metrics", phase)
+
+        # Optional order endpoint for phones and POS stand-ins, enabled by CBR_ORDER_API_PORT
+        self.order_api = serve_order_api(lambda: self.recipes, self.inventory, self.order_queue,
+                                         self.order_scheduler, self.estimate_pour, telemetry=self.telemetry)
+        self.telemetry.phase("order_api", phase)
+        self.telemetry.phase("total", started)
 
     def load_cocktail_data(self):
         for cocktail in self.recipes:
             self.cocktail_names.append(cocktail)
 
-            # Check if the image is available in the local "imgpath"
-            local_img_path = self.recipes[cocktail]['imgpath']
-            if os.path.exists(local_img_path):
-                try:
-                    image = Image.open(local_img_path)
-                    image = image.resize((210, 210), Image.BILINEAR)
-                    self.cocktail_images.append(ImageTk.PhotoImage(image))
-                except Exception as e:
-                    print(f"Error loading image for {cocktail} from local imgpath: {e}")
-                    # Fall back to image_url if there is an error with the local image
-                    self.load_image_from_url(cocktail)
+    def image_loaded(self, cocktail, image):
+        # Swapping the placeholder for the real image if the tile is still on screen
+        if cocktail in self.cocktail_buttons:
+            self.cocktail_images[cocktail] = image
+            self.cocktail_buttons[cocktail].configure(image=image)
+        self.details_panel.update_image(cocktail, image)
+
+    def create_cocktail_buttons(self):
+        self.tile_grid.set_count(len(self.cocktail_names))
+
+    def make_cocktail_tile(self, idx):
+        cocktail = self.cocktail_names[idx]
+        btn_frame = tk.Frame(self.canva, bg="#F8C471")
+
+        btn = tk.Button(btn_frame, image=self.image_loader.placeholder,
+                        command=lambda idx=idx: self.show_cocktail_details(idx))
+        btn.pack(pady=(10, 0))
+        self.cocktail_buttons[cocktail] = btn
+
+        label = tk.Label(btn_frame, text=cocktail)
+        label.pack()
+        self.cocktail_labels[cocktail] = label
+        self.set_tile_available(cocktail)
+
+        # Scrolling back to a tile is cheap thanks to the thumbnail cache
+        self.image_loader.load(cocktail, self.recipes[cocktail].imgpath,
+                               self.recipes[cocktail].image_url, self.image_loaded)
+        return btn_frame
+
+    def release_cocktail_tile(self, idx):
+        cocktail = self.cocktail_names[idx]
+        self.cocktail_buttons.pop(cocktail, None)
+        self.cocktail_labels.pop(cocktail, None)
+        self.cocktail_images.pop(cocktail, None)
+
+    def set_tile_available(self, cocktail):
+        available = cocktail not in self.unavailable
+        self.cocktail_buttons[cocktail].configure(state=tk.NORMAL if available else tk.DISABLED)
+        self.cocktail_labels[cocktail].configure(fg="black" if available else "grey")
+
+    def poll_inventory(self):
+        # Only recipes drawing from a reservoir whose level moved are rechecked
+        self.inventory.refresh()
+        for cocktail in self.recipes.recipes_using(self.inventory.take_changes()):
+            if self.inventory.can_pour(self.recipes[cocktail]):
+                self.unavailable.discard(cocktail)
             else:
-                # If the image is not available in "imgpath," load it from "image_url"
-                self.load_image_from_url(cocktail)
+                self.unavailable.add(cocktail)
+            if cocktail in self.cocktail_buttons:
+                self.set_tile_available(cocktail)
+        self.root.after(500, self.poll_inventory)
 
-    def load_image_from_url(self, cocktail):
-        # Load the image from "image_url"
-        response = requests.get(self.recipes[cocktail]['image_url'])
-        try:
-            image = Image.open(BytesIO(response.content))
-            image = image.resize((210, 210), Image.BILINEAR)
-            self.cocktail_images.append(ImageTk.PhotoImage(image))
-        except Exception as e:
-            print(f"Error loading image for {cocktail} from image_url: {e}")
-            # Set a default image or handle the error accordingly
-            self.cocktail_images.append(None)
+    def apply_recipe_changes(self, recipes, added, removed, changed):
+        print(f"Menu updated: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
 
-    def create_cocktail_buttons(self):
-        for i, cocktail in enumerate(self.cocktail_names):
-            btn_frame = tk.Frame(self.jongo2, bg="#F8C471")
-            btn_frame.grid(row=i // 2, column=i % 2, padx=10, pady=10)
+        for cocktail in removed + changed:
+            self.details_panel.forget(cocktail)
+        if self.details_panel.cocktail in removed:
+            self.details_panel.hide()
+
+        self.unavailable = self.inventory.unavailable(recipes)
+        self.recipe_index = RecipeIndex(recipes)
+        self.ingredient_filter.set_ingredients(self.recipe_index.ingredient_names)
+        self.show_cocktails(self.visible_cocktails(), changed)
+        self.recipes = recipes
+
+    def visible_cocktails(self):
+        return self.recipe_index.search(self.search_text.get(), self.ingredient_filter.excluded())
 
-            btn = tk.Button(btn_frame, image=self.cocktail_images[i],
-                            command=lambda idx=i: self.show_cocktail_details(idx))
-            btn.pack()
+    def filter_cocktails(self):
+        self.show_cocktails(self.visible_cocktails())
+        self.canva.yview_moveto(0)
 
-            label = tk.Label(btn_frame, text=cocktail)
-            label.pack()
+    def show_cocktails(self, new_names, changed=()):
+        # Only tiles whose slot now shows another drink, or whose drink changed,
+        # are released (while the old names still describe them) and rebuilt
+        stale = set()
+        for idx, cocktail in enumerate(self.cocktail_names):
+            if idx >= len(new_names) or new_names[idx] != cocktail or cocktail in changed:
+                stale.add(idx)
+        self.tile_grid.patch(len(new_names), stale)
+        self.cocktail_names = new_names
 
     def show_cocktail_details(self, idx):
         selected_cocktail = self.cocktail_names[idx]
-        cocktail_data = self.recipes[selected_cocktail]
-
-        details_window = tk.Toplevel(self.root, bg="#F8C471")
-        details_window.title(selected_cocktail)
-        details_window.geometry("500x500") 
-
-        # Displaying cocktail image
-        image_frame = tk.Frame(details_window, bg="#F8C471")
-        image_frame.pack(pady=10)
-        image_label = tk.Label(image_frame, image=self.cocktail_images[idx])
-        image_label.pack()
-
-        # Displaying cocktail ingredients
-        ingredients_frame = tk.Frame(details_window, bg="#F8C471")
-        ingredients_frame.pack(pady=10)
-        for ingredient in cocktail_data['ingredients']:
-            ingredient_label = tk.Label(ingredients_frame, text=f"{ingredient['name']}: {ingredient['quantity']} ml", bg="#F8C471")
-            ingredient_label.pack()
-
-        # Order button
-        def order_cocktails():
-            num_cocktails = 1  # Since we removed the slider
-            self.make_cocktails(selected_cocktail, num_cocktails)
-            details_window.destroy()
-
-        order_button = tk.Button(details_window, text="Press to order", command=order_cocktails)
-        order_button.pack(pady=10)
-
-        # Calculate the position of the top-level window on the right-hand side
-        x, y, _, _ = self.canva.bbox("all")
-        x_offset = 10  # 
-        y_offset = 10  # 
-        details_window.geometry(f"+{self.root.winfo_x() + x + x_offset}+{self.root.winfo_y() + y + y_offset}")
-
-    def make_cocktails(self, cocktail_name, num_cocktails):
-        selected_cocktail = self.recipes[cocktail_name]
+        image = self.cocktail_images.get(selected_cocktail, self.image_loader.placeholder)
+
+        # Placing the panel at the top-left of the menu, as bbox("all") used to
+        x_offset = 10
+        y_offset = 10
+        position = (self.root.winfo_x() + x_offset, self.root.winfo_y() + y_offset)
+        self.details_panel.show(selected_cocktail, self.recipes[selected_cocktail].ingredients, image, position)
+
+    def order_cocktails(self, cocktail_name, num_cocktails, pitcher=False):
+        # Queuing returns at once, even while another drink is pouring. The
+        # stock is held for the order as it is queued, so orders behind it
+        # can't be promised the same liquid.
+        recipe = self.recipes[cocktail_name]
+        try:
+            self.last_order = self.order_queue.put(
+                cocktail_name, num_cocktails, pitcher,
+                admit=lambda order: self.inventory.reserve(order.order_id, recipe, num_cocktails))
+        except OutOfStock as e:
+            self.status_label.configure(text=f"Not enough {', '.join(e.short)} left for {num_cocktails} {cocktail_name}")
+            return
+        self.telemetry.record("order_placed", order=self.last_order.order_id, cocktail=cocktail_name,
+                              count=num_cocktails, queue_depth=len(self.order_queue))
+        self.update_queue_label(reschedule=False)
+
+    def order_failed(self, orders, error):
+        # Runs on the scheduler thread: the held stock goes back, the guest is told on the next label update
+        for order in orders:
+            self.inventory.release(order.order_id)
+        self.failed_orders.append((orders, error))
+
+    def update_queue_label(self, reschedule=True):
+        while self.failed_orders:
+            orders, error = self.failed_orders.popleft()
+            order_ids = ", ".join(f"#{order.order_id}" for order in orders)
+            self.status_label.configure(text=f"Order {order_ids} ({orders[0].cocktail_name}) could not be poured: {error}")
+        text = f"Queue: {len(self.order_queue)} waiting"
+        if self.last_order is not None:
+            position = self.order_queue.position(self.last_order.order_id)
+            if position is not None:
+                text += f"  |  Order #{self.last_order.order_id} ({self.last_order.cocktail_name}) is number {position} in line"
+        self.queue_label.configure(text=text)
+        if reschedule:
+            self.root.after(500, self.update_queue_label)
+
+    def make_cocktails(self, cocktail_name, num_cocktails, orders=None):
+        recipe = self.recipes[cocktail_name]
         print(f"Preparing {num_cocktails} {cocktail_name}(s)...")
 
-        # Getting the ingredient motors and volumes for the selected cocktail
-        ingredients = selected_cocktail['ingredients']
+        # Pins and run times were precomputed when the recipe store was built;
+        # one glass per drink, or as few fills as a pitcher order needs
+        pitcher = any(order.pitcher for order in orders or ())
+        plan = plan_batch(recipe.run_times, num_cocktails, recipe.drink_ml, pitcher=pitcher,
+                          dead_times=recipe.dead_times)
 
-        # Calculating the estimated pump run times based on ingredient volumes
-        run_times = []
-        for ingredient in ingredients:
-            volume = ingredient['quantity']
-            motor_pin = relay_pins[ingredient['motor']] 
-            run_time = volume / 105  #Volume / flow rate
-            run_times.append((motor_pin, run_time))
+        # Runs on the order scheduler's thread; the executor does the pouring
+        job = PourJob(cocktail_name, num_cocktails, recipe.run_times, plan=plan, orders=orders,
+                      volumes=recipe.volumes)
+        job = self.pour_executor.submit(job)
 
-        # Activating all the required motors to pour the ingredients
-        try:
-            for motor_pin, run_time in run_times:
-                GPIO.output(motor_pin, GPIO.LOW)
-                time.sleep(run_time)
-                GPIO.output(motor_pin, GPIO.HIGH)
-        except KeyboardInterrupt:
-            print("Process interrupted by the user.")
-        finally:
+        # Only now does the stock held when the orders were queued leave the
+        # reservoirs: if anything above raised, order_failed releases it instead.
+        # A pour that fails halfway keeps the debit, since its pumps did run.
+        for order in orders or ():
+            self.inventory.commit(order.order_id)
+        return job
+
+    def estimate_pour(self, cocktail_name, num_cocktails, pitcher=False):
+        recipe = self.recipes[cocktail_name]
+        plan = plan_batch(recipe.run_times, num_cocktails, recipe.drink_ml, pitcher=pitcher,
+                          dead_times=recipe.dead_times)
+        return plan.duration("sequential")
+
+    def pour_started(self, job):
+        station = f" at station {job.station + 1}" if job.station is not None else ""
+        self.status_label.configure(text=f"Pouring {job.num_cocktails} {job.cocktail_name}(s){station}...")
+
+    def pour_progress(self, job):
+        if job.state == "swapping":
+            vessel = "Place a pitcher" if job.plan.vessel == "pitcher" else "Swap the glass"
+            self.status_label.configure(text=f"{vessel} for {job.cocktail_name} ({job.fill + 1}/{len(job.plan.fills)})")
+            return
+        self.status_label.configure(text=f"Pouring {job.cocktail_name}: {job.done}/{job.total} ingredients")
+
+    def pour_finished(self, job):
+        if job.state == "done":
             print("Cocktails ready!")
+            order_ids = ", ".join(f"#{order.order_id}" for order in job.orders)
+            self.status_label.configure(text=f"{job.cocktail_name} ready! {order_ids}".strip())
+        elif job.state == "short":
+            # A metered pump timed out before its volume: the drink is missing an ingredient
+            short = ", ".join(f"pin {pin} poured {measured:.0f} of {target:.0f} ml"
+                              for pin, (target, measured) in sorted(job.flow_shortfalls.items()))
+            print(f"Pour of {job.cocktail_name} came out short: {short}")
+            self.status_label.configure(text=f"{job.cocktail_name} came out short ({short}), check the bottles")
+        else:
+            print(f"Pour of {job.cocktail_name} {job.state}.")
+            self.status_label.configure(text=f"{job.cocktail_name} {job.state}")
+
+    def turn_on_relay(self, pin):
+        self.board.relay_on(pin)
+
+    def turn_off_relay(self, pin):
+        self.board.relay_off(pin)
 
     def run(self):
         self.root.mainloop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        if self.order_api is not None:
+            self.order_api.stop()
+        self.order_scheduler.stop()
+        self.recipe_watcher.stop()
+        self.image_loader.shutdown()
+        self.pour_executor.shutdown()
+        self.relay_watchdog.stop()
+        self.telemetry.close()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -164,4 +377,4 @@ if __name__ == "__main__":
     root.geometry("700x500")
     app = CocktailBartenderRobotGUI(root, recipes)
     app.run()
-    GPIO.cleanup()
+    app.board.cleanup()